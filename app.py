@@ -1,24 +1,62 @@
 """
 AI 음성 주식매매 챗봇 - Flask 메인 서버
 """
-from flask import Flask, request, jsonify, send_file, render_template, send_from_directory
+# gevent 패치는 requests 등 네트워크 모듈보다 먼저 적용해야 함
+from gevent import monkey
+monkey.patch_all()
+
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import atexit
+import hashlib
+import logging
+import orjson
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 
 # 자체 모듈 임포트
-from parser import parse_command, STOCK_DATABASE
+from parser import parse_command, STOCK_DATABASE, GPT_CACHE
 from kis_api import KISApi
 from database import Database
-from stt_tts import clova_stt, text_to_speech
+from stt_tts import clova_stt, text_to_speech_stream, TTS_CACHE
+from cache import LRUCache
+from logging_config import setup_logging
 
 # 환경변수 로드
 load_dotenv()
 
+# 로깅 설정 (출력은 백그라운드 스레드에서 처리)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(JSONProvider):
+    """orjson 기반 JSON 처리 (jsonify, request.json 모두 적용)
+
+    한글을 이스케이프하지 않고 UTF-8 바이트로 바로 직렬화합니다.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
 # Flask 앱 생성 - static 폴더 설정 추가
 app = Flask(__name__, 
             static_url_path='/static',
             static_folder='public/static')
+app.json = OrjsonProvider(app)
 CORS(app)  # CORS 허용
 
 # ===== 설정 =====
@@ -30,31 +68,229 @@ CLOVA_CLIENT_SECRET = os.getenv('CLOVA_CLIENT_SECRET')
 KIS_APP_KEY = os.getenv('KIS_APP_KEY')
 KIS_APP_SECRET = os.getenv('KIS_APP_SECRET')
 KIS_ACCOUNT_NO = os.getenv('KIS_ACCOUNT_NO')
+KIS_RETRY_INTERVAL = 60  # 한투 API 초기화 실패 후 재시도 간격(초)
 
 # ===== 인스턴스 생성 =====
-# 한투 API (모의투자로 시작)
-kis_api = None
-if KIS_APP_KEY and KIS_APP_SECRET and KIS_ACCOUNT_NO:
-    try:
-        kis_api = KISApi(KIS_APP_KEY, KIS_APP_SECRET, KIS_ACCOUNT_NO, is_real=True)
-        print("한국투자증권 API 초기화 완료")
-    except Exception as e:
-        print(f"한국투자증권 API 초기화 실패: {str(e)}")
-        print("   API 키를 확인하거나 나중에 설정하세요.")
-
-# Supabase Database
-db = None
-try:
-    db = Database()  # Supabase는 파라미터 불필요
-    if db.test_connection():
-        print("데이터베이스 연결 완료")
-except Exception as e:
-    print(f"데이터베이스 연결 실패: {str(e)}")
-    print("   Supabase 설정을 확인하세요.")
+# import 시점이 아닌 첫 사용 시 생성 (서버 워커 시작 시간 단축)
+_kis_api = None
+_kis_ready = False
+_kis_retry_at = 0.0
+_db = None
+_db_ready = False
+_init_lock = threading.Lock()
+
+
+def get_kis():
+    """한투 API 인스턴스 (첫 호출 시 토큰 발급, 실패시 None)
+
+    토큰 발급에 실패하면 KIS_RETRY_INTERVAL초 뒤 요청에서 다시 시도합니다.
+    (한투 토큰 발급은 1분에 1회로 제한되므로 바로 재시도하지 않음)
+    """
+    global _kis_api, _kis_ready, _kis_retry_at
+
+    if not _kis_ready and time.monotonic() >= _kis_retry_at:
+        with _init_lock:
+            if not _kis_ready and time.monotonic() >= _kis_retry_at:
+                if not (KIS_APP_KEY and KIS_APP_SECRET and KIS_ACCOUNT_NO):
+                    _kis_ready = True  # 설정이 없으면 재시도하지 않음
+                else:
+                    try:
+                        _kis_api = KISApi(KIS_APP_KEY, KIS_APP_SECRET, KIS_ACCOUNT_NO, is_real=True)
+                        _kis_ready = True
+                        logger.info("한국투자증권 API 초기화 완료")
+                    except Exception:
+                        _kis_retry_at = time.monotonic() + KIS_RETRY_INTERVAL
+                        logger.exception("한국투자증권 API 초기화 실패 - %d초 후 다시 시도합니다.",
+                                         KIS_RETRY_INTERVAL)
+
+    return _kis_api
+
+
+def get_db():
+    """Supabase Database 인스턴스 (첫 호출 시 연결, 실패시 None)"""
+    global _db, _db_ready
+
+    if not _db_ready:
+        with _init_lock:
+            if not _db_ready:
+                try:
+                    _db = Database.instance()  # Supabase는 파라미터 불필요
+                    if _db.test_connection():
+                        logger.info("데이터베이스 연결 완료")
+                except Exception as e:
+                    logger.warning("데이터베이스 연결 실패: %s - Supabase 설정을 확인하세요.", e)
+                _db_ready = True
+
+    return _db
+
 
 # 임시 사용자 ID (실제로는 로그인 시스템 필요)
 TEMP_USER_ID = 1
 
+# ===== 캐시 =====
+STT_CACHE = LRUCache(maxsize=512)  # 음성 데이터 SHA1 → 인식 텍스트
+PARSE_CACHE = LRUCache(maxsize=2048)  # 정규화된 텍스트 → 파싱 결과
+HEALTH_CACHE = LRUCache(maxsize=1, ttl=10.0)  # DB 연결 상태 (10초)
+
+# ===== 병렬 처리 =====
+# 주문 확인용 현재가를 검증과 동시에 조회하는 스레드 풀
+# max_workers는 워커당 동시에 진행 중인 조회 수의 상한 (초과분은 대기 후 PRICE_TIMEOUT이 지나면 예상금액 생략)
+# 초당 호출 수 제한은 풀 크기가 아니라 KISApi의 토큰 버킷(kis_api.rate_limit_per_worker)이 담당
+EXECUTOR = ThreadPoolExecutor(max_workers=16)
+PRICE_TIMEOUT = 1.5  # 주문 확인용 현재가 조회 대기 시간(초)
+
+# ===== 응답 템플릿 =====
+KIS_NOT_CONFIGURED = {
+    "message": "한국투자증권 API가 설정되지 않았습니다.\n.env 파일에 API 키를 설정해주세요.",
+    "speak": False
+}
+
+HELP_REPLY = {
+    "message": """무엇을 도와드릴까요?
+
+사용 가능한 명령어:
+- "삼성전자 현재가?"
+- "네이버 10주 사줘"
+- "카카오 전부 팔아"
+- "내 잔고 확인"
+- "보유 종목 보여줘"
+
+음성 또는 키보드로 입력하세요.""",
+    "speak": True
+}
+
+# 값이 들어가지 않는 음성 응답 (워커 시작 시 TTS 캐시에 미리 생성, TTS_WARMUP=1)
+FIXED_SPOKEN_REPLIES = (
+    HELP_REPLY["message"],
+    "어떤 종목의 현재가를 알려드릴까요?",
+    "어떤 종목을 거래하시겠어요?",
+    "보유 중인 종목이 없습니다.",
+    "현재가 조회에 실패했습니다.",
+    "잔고 조회에 실패했습니다.",
+    "보유종목 조회에 실패했습니다.",
+)
+
+# 고정 응답은 JSON 직렬화를 미리 해둠 (Response 객체는 요청마다 새로 생성)
+NO_AUDIO_JSON = orjson.dumps({"error": "음성 파일이 없습니다"})
+NO_CLOVA_KEY_JSON = orjson.dumps({"error": "Clova API 키가 설정되지 않았습니다"})
+NO_TEXT_JSON = orjson.dumps({"error": "텍스트가 없습니다"})
+KIS_NOT_CONFIGURED_JSON = orjson.dumps(KIS_NOT_CONFIGURED)
+ORDER_KIS_NOT_CONFIGURED_JSON = orjson.dumps({
+    "success": False,
+    "message": "한국투자증권 API가 설정되지 않았습니다."
+})
+
+
+def json_bytes_response(body: bytes, status: int = 200) -> Response:
+    """미리 직렬화한 JSON 본문으로 응답 생성"""
+    return Response(body, status=status, mimetype='application/json')
+
+
+HOLDING_TMPL = (
+    "{i}. {stock_name}\n"
+    "   {quantity}주 | {current_price:,}원\n"
+    "   손익: {profit_loss:+,}원 ({profit_rate:+.2f}%)\n\n"
+)
+
+# ===== 채팅 로그 백그라운드 저장 =====
+# 응답을 기다리게 하지 않도록 큐에 넣고 별도 스레드에서 모아서 저장
+LOG_Q = queue.Queue()
+LOG_BATCH_SIZE = 500  # 한 번에 저장할 최대 로그 수 (insert 요청 1회)
+LOG_BATCH_WAIT = 0.2  # 로그를 모으는 최대 대기 시간(초)
+_log_worker = None
+_log_worker_lock = threading.Lock()
+
+
+def audio_cache_key(stream) -> str:
+    """음성 파일 SHA1 (전체를 메모리에 읽지 않고 조각 단위로 계산)"""
+    sha1 = hashlib.sha1()
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        sha1.update(chunk)
+    stream.seek(0)
+    return sha1.hexdigest()
+
+
+def parse_command_cached(text: str) -> dict:
+    """명령어 파싱 (같은 문장은 캐시된 결과 사용)"""
+    key = ' '.join(text.split())
+    parsed = PARSE_CACHE.get(key)
+
+    if parsed is None:
+        parsed = parse_command(text)
+        PARSE_CACHE.set(key, parsed)
+
+    return dict(parsed)  # 캐시 원본 보호
+
+
+def check_database() -> bool:
+    """DB 연결 상태 (헬스 체크가 자주 호출되어도 10초에 한 번만 확인)"""
+    ok = HEALTH_CACHE.get('database')
+
+    if ok is None:
+        db = get_db()
+        ok = db is not None and db.test_connection()
+        HEALTH_CACHE.set('database', ok)
+
+    return ok
+
+
+def _write_chat_logs(logs: list) -> None:
+    """채팅 로그 일괄 저장 (DB 오류는 무시)"""
+    try:
+        get_db().save_chat_logs(logs)
+    except Exception:
+        logger.exception("채팅 로그 저장 오류")
+
+
+def _drain_chat_logs() -> None:
+    """큐의 채팅 로그를 최대 LOG_BATCH_SIZE개씩 모아서 저장 (백그라운드 스레드)"""
+    while True:
+        logs = [LOG_Q.get()]
+        deadline = time.monotonic() + LOG_BATCH_WAIT
+
+        while len(logs) < LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                logs.append(LOG_Q.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        _write_chat_logs(logs)
+
+
+def save_chat_log_async(user_id: int, message: str, sender: str) -> None:
+    """채팅 로그 저장 요청 (즉시 반환, 백그라운드에서 저장)"""
+    global _log_worker
+
+    if not get_db():
+        return
+
+    LOG_Q.put({'user_id': user_id, 'message': message, 'sender': sender})
+
+    # 워커 스레드는 첫 요청 시 시작 (fork된 워커 프로세스마다 별도 실행)
+    if _log_worker is None or not _log_worker.is_alive():
+        with _log_worker_lock:
+            if _log_worker is None or not _log_worker.is_alive():
+                _log_worker = threading.Thread(target=_drain_chat_logs, daemon=True)
+                _log_worker.start()
+
+
+@atexit.register
+def flush_chat_logs() -> None:
+    """종료 전 큐에 남은 채팅 로그 저장"""
+    logs = []
+    while True:
+        try:
+            logs.append(LOG_Q.get_nowait())
+        except queue.Empty:
+            break
+
+    if logs and get_db():
+        for i in range(0, len(logs), LOG_BATCH_SIZE):
+            _write_chat_logs(logs[i:i + LOG_BATCH_SIZE])
+
 
 # ===== 라우트 =====
 
@@ -86,22 +322,24 @@ def voice_to_text():
     try:
         audio_file = request.files.get('audio')
         if not audio_file:
-            return jsonify({"error": "음성 파일이 없습니다"}), 400
+            return json_bytes_response(NO_AUDIO_JSON, 400)
 
         if not CLOVA_CLIENT_ID or not CLOVA_CLIENT_SECRET:
-            return jsonify({"error": "Clova API 키가 설정되지 않았습니다"}), 500
+            return json_bytes_response(NO_CLOVA_KEY_JSON, 500)
+
+        # Clova STT 호출 (같은 음성은 캐시된 결과 사용)
+        # 업로드 stream을 그대로 전달하여 음성 데이터를 복사하지 않음
+        audio_key = audio_cache_key(audio_file.stream)
+        text = STT_CACHE.get(audio_key)
 
-        # Clova STT 호출
-        audio_data = audio_file.read()
-        text = clova_stt(audio_data, CLOVA_CLIENT_ID, CLOVA_CLIENT_SECRET)
+        if text is None:
+            text = clova_stt(audio_file.stream, CLOVA_CLIENT_ID, CLOVA_CLIENT_SECRET)
+            if text:
+                STT_CACHE.set(audio_key, text)
 
         if text:
             # 채팅 로그 저장
-            if db:
-                try:
-                    db.save_chat_log(TEMP_USER_ID, text, 'user')
-                except:
-                    pass  # DB 오류 무시
+            save_chat_log_async(TEMP_USER_ID, text, 'user')
 
             return jsonify({
                 "success": True,
@@ -114,7 +352,7 @@ def voice_to_text():
             }), 400
 
     except Exception as e:
-        print(f"음성 인식 오류: {str(e)}")
+        logger.exception("음성 인식 오류")
         return jsonify({"error": str(e)}), 500
 
 
@@ -126,189 +364,196 @@ def process_command_api():
         text = data.get('text', '')
 
         if not text:
-            return jsonify({"error": "텍스트가 없습니다"}), 400
+            return json_bytes_response(NO_TEXT_JSON, 400)
+
+        # API가 없으면 파싱/로그 저장 없이 바로 안내
+        if not get_kis():
+            return json_bytes_response(KIS_NOT_CONFIGURED_JSON)
 
         # 키보드 입력은 채팅 로그 저장
-        if data.get('input_type') == 'keyboard' and db:
-            try:
-                db.save_chat_log(TEMP_USER_ID, text, 'user')
-            except:
-                pass
+        if data.get('input_type') == 'keyboard':
+            save_chat_log_async(TEMP_USER_ID, text, 'user')
 
         # 명령어 파싱
-        parsed = parse_command(text)
+        parsed = parse_command_cached(text)
 
         # 응답 생성
         response = handle_command(parsed)
 
         # 봇 응답 저장
-        if db and response.get('message'):
-            try:
-                db.save_chat_log(TEMP_USER_ID, response['message'], 'bot')
-            except:
-                pass
+        if response.get('message'):
+            save_chat_log_async(TEMP_USER_ID, response['message'], 'bot')
 
         return jsonify(response)
 
     except Exception as e:
-        print(f"명령 처리 오류: {str(e)}")
+        logger.exception("명령 처리 오류")
         return jsonify({
             "error": str(e),
             "message": "오류가 발생했습니다. 다시 시도해주세요."
         }), 500
 
 
-def handle_command(parsed: dict) -> dict:
-    """파싱된 명령어 처리"""
-
-    cmd_type = parsed.get('type')
-
-    # API가 없는 경우 안내
-    if not kis_api:
+def _handle_price(parsed: dict, kis_api) -> dict:
+    """현재가 조회"""
+    stock = parsed.get('stock')
+    if not stock:
         return {
-            "message": "한국투자증권 API가 설정되지 않았습니다.\n.env 파일에 API 키를 설정해주세요.",
-            "speak": False
+            "message": "어떤 종목의 현재가를 알려드릴까요?",
+            "speak": True
         }
 
-    # 1. 조회 명령
-    if cmd_type == 'query':
-        query_type = parsed['query_type']
-
-        # 현재가 조회
-        if query_type == '현재가':
-            stock = parsed.get('stock')
-            if not stock:
-                return {
-                    "message": "어떤 종목의 현재가를 알려드릴까요?",
-                    "speak": True
-                }
-
-            stock_code = parsed.get('stock_code')
-            result = kis_api.get_current_price(stock_code)
+    stock_code = parsed.get('stock_code')
+    result = kis_api.get_current_price(stock_code)
 
-            if result['success']:
-                msg = f"""{result['stock_name']} 현재가
+    if result['success']:
+        msg = f"""{result['stock_name']} 현재가
 현재가: {result['current_price']:,}원
 전일대비: {result['change']:+,}원 ({result['change_rate']:+.2f}%)
 거래량: {result['volume']:,}주"""
-                return {"message": msg, "speak": True}
-            else:
-                return {"message": result.get('message', "현재가 조회에 실패했습니다."), "speak": True}
+        return {"message": msg, "speak": True}
+    else:
+        return {"message": result.get('message', "현재가 조회에 실패했습니다."), "speak": True}
 
-        # 잔고 조회
-        elif query_type == '잔고':
-            result = kis_api.get_balance()
 
-            if result['success']:
-                msg = f"""계좌 정보
+def _handle_balance(parsed: dict, kis_api) -> dict:
+    """잔고 조회"""
+    result = kis_api.get_balance()
+
+    if result['success']:
+        msg = f"""계좌 정보
 예수금: {result['deposit']:,}원
 총 평가액: {result['total_value']:,}원
 평가 손익: {result['profit_loss']:+,}원 ({result['profit_rate']:+.2f}%)"""
-                return {"message": msg, "speak": True}
-            else:
-                return {"message": result.get('message', "잔고 조회에 실패했습니다."), "speak": True}
-
-        # 보유종목 조회
-        elif query_type == '보유종목':
-            result = kis_api.get_holdings()
-
-            if result['success']:
-                if result['count'] == 0:
-                    return {"message": "보유 중인 종목이 없습니다.", "speak": True}
-
-                msg = f"보유 종목 ({result['count']}개)\n\n"
-                for i, stock in enumerate(result['holdings'], 1):
-                    msg += f"{i}. {stock['stock_name']}\n"
-                    msg += f"   {stock['quantity']}주 | {stock['current_price']:,}원\n"
-                    msg += f"   손익: {stock['profit_loss']:+,}원 ({stock['profit_rate']:+.2f}%)\n\n"
-
-                return {"message": msg.strip(), "speak": True}
-            else:
-                return {"message": result.get('message', "보유종목 조회에 실패했습니다."), "speak": True}
-
-    # 2. 매매 명령
-    elif cmd_type == 'trade':
-        stock = parsed.get('stock')
-        quantity = parsed.get('quantity')
-        action = parsed.get('action')
-
-        # 유효성 검증
-        if not stock:
-            return {"message": "어떤 종목을 거래하시겠어요?", "speak": True}
-
-        if not quantity:
-            return {"message": f"{stock} 몇 주를 {action}하시겠어요?", "speak": True}
-
-        # 확인 요청
-        price_type = parsed.get('price_type', '시장가')
-        price = parsed.get('price', 0)
-
-        # 현재가 조회 (예상금액 계산)
-        stock_code = parsed.get('stock_code')
-        price_info = kis_api.get_current_price(stock_code)
-        estimated_price = 0
-
-        if price_info['success']:
-            if quantity == -1:  # 전량 매도
-                estimated_price = 0
-                quantity_text = "전량"
-            else:
-                estimated_price = price_info['current_price'] * quantity
-                quantity_text = f"{quantity}주"
-        else:
-            quantity_text = f"{quantity}주" if quantity != -1 else "전량"
+        return {"message": msg, "speak": True}
+    else:
+        return {"message": result.get('message', "잔고 조회에 실패했습니다."), "speak": True}
 
-        confirm_msg = f"""주문 확인
+
+def _handle_holdings(parsed: dict, kis_api) -> dict:
+    """보유종목 조회"""
+    result = kis_api.get_holdings()
+
+    if result['success']:
+        if result['count'] == 0:
+            return {"message": "보유 중인 종목이 없습니다.", "speak": True}
+
+        parts = [f"보유 종목 ({result['count']}개)\n\n"]
+        parts.extend(
+            HOLDING_TMPL.format(i=i, **stock)
+            for i, stock in enumerate(result['holdings'], 1)
+        )
+        msg = ''.join(parts)
+
+        return {"message": msg.strip(), "speak": True}
+    else:
+        return {"message": result.get('message', "보유종목 조회에 실패했습니다."), "speak": True}
+
+
+def _handle_trade(parsed: dict, kis_api) -> dict:
+    """매매 명령 (주문 확인 요청)"""
+    stock = parsed.get('stock')
+    quantity = parsed.get('quantity')
+    action = parsed.get('action')
+    stock_code = parsed.get('stock_code')
+    price_type = parsed.get('price_type', '시장가')
+    price = parsed.get('price', 0)
+
+    # 예상금액에 현재가가 필요한 경우만 조회
+    # (전량 매도는 예상금액 미표시, 지정가는 주문 가격으로 계산)
+    is_limit_priced = price_type != '시장가' and price > 0
+    price_future = None
+    if stock_code and quantity and quantity != -1 and not is_limit_priced:
+        # 조회를 먼저 시작하고 그동안 유효성 검증
+        price_future = EXECUTOR.submit(kis_api.get_current_price, stock_code)
+
+    # 유효성 검증
+    if not stock:
+        return {"message": "어떤 종목을 거래하시겠어요?", "speak": True}
+
+    if not quantity:
+        return {"message": f"{stock} 몇 주를 {action}하시겠어요?", "speak": True}
+
+    # 확인 요청
+    estimated_price = 0
+
+    if quantity == -1:  # 전량 매도
+        quantity_text = "전량"
+    else:
+        quantity_text = f"{quantity}주"
+
+        if is_limit_priced:
+            estimated_price = price * quantity
+        elif price_future:
+            # 현재가 조회 결과 (시간 초과시 예상금액 생략)
+            try:
+                price_info = price_future.result(timeout=PRICE_TIMEOUT)
+                if price_info['success']:
+                    estimated_price = price_info['current_price'] * quantity
+            except FutureTimeoutError:
+                logger.warning("현재가 조회 시간 초과: %s", stock_code)
+
+    confirm_msg = f"""주문 확인
 
 종목: {stock}
 수량: {quantity_text}
 방식: {price_type}"""
 
-        if estimated_price > 0:
-            confirm_msg += f"\n예상금액: {estimated_price:,}원"
+    if estimated_price > 0:
+        confirm_msg += f"\n예상금액: {estimated_price:,}원"
+
+    confirm_msg += f"\n\n정말 {action}하시겠어요?"
+
+    return {
+        "type": "confirm",
+        "message": confirm_msg,
+        "speak": True,
+        "confirm_data": {
+            "stock": stock,
+            "stock_code": stock_code,
+            "quantity": quantity,
+            "action": action,
+            "price_type": price_type,
+            "price": price
+        }
+    }
 
-        confirm_msg += f"\n\n정말 {action}하시겠어요?"
 
-        return {
-            "type": "confirm",
-            "message": confirm_msg,
-            "speak": True,
-            "confirm_data": {
-                "stock": stock,
-                "stock_code": stock_code,
-                "quantity": quantity,
-                "action": action,
-                "price_type": price_type,
-                "price": price
-            }
-        }
+def _handle_unknown(parsed: dict, kis_api) -> dict:
+    """알 수 없는 명령 (사용법 안내)"""
+    return dict(HELP_REPLY)
 
-    # 3. 알 수 없는 명령
-    else:
-        return {
-            "message": """무엇을 도와드릴까요?
 
-사용 가능한 명령어:
-- "삼성전자 현재가?"
-- "네이버 10주 사줘"
-- "카카오 전부 팔아"
-- "내 잔고 확인"
-- "보유 종목 보여줘"
+# 명령 처리 함수: (type, query_type) -> 함수
+HANDLERS = {
+    ('query', '현재가'): _handle_price,
+    ('query', '잔고'): _handle_balance,
+    ('query', '보유종목'): _handle_holdings,
+    ('trade', None): _handle_trade,
+}
 
-음성 또는 키보드로 입력하세요.""",
-            "speak": True
-        }
+
+def handle_command(parsed: dict) -> dict:
+    """파싱된 명령어 처리"""
+    kis_api = get_kis()
+
+    # API가 없는 경우 안내
+    if not kis_api:
+        return dict(KIS_NOT_CONFIGURED)
+
+    handler = HANDLERS.get(
+        (parsed.get('type'), parsed.get('query_type')), _handle_unknown
+    )
+    return handler(parsed, kis_api)
 
 
 @app.route('/api/execute-order', methods=['POST'])
 def execute_order():
     """주문 실행"""
     try:
+        kis_api = get_kis()
         if not kis_api:
-            return jsonify({
-                "success": False,
-                "message": "한국투자증권 API가 설정되지 않았습니다."
-            }), 500
+            return json_bytes_response(ORDER_KIS_NOT_CONFIGURED_JSON, 500)
 
         data = request.json
         confirm_data = data.get('confirm_data')
@@ -325,7 +570,8 @@ def execute_order():
         else:
             result = kis_api.sell_stock(stock_code, quantity, price_type, price)
 
-        # DB에 저장
+        # DB에 저장 (주문 내역 + 응답을 한 번에)
+        db = get_db()
         if result['success'] and db:
             try:
                 order_data = {
@@ -337,16 +583,13 @@ def execute_order():
                     'order_price': price,
                     'order_no': result.get('order_no', '')
                 }
-                db.save_order(TEMP_USER_ID, order_data)
-            except Exception as e:
-                print(f"DB 저장 오류: {str(e)}")
+                db.save_order_and_log(TEMP_USER_ID, order_data, result['message'])
+            except Exception:
+                logger.exception("DB 저장 오류")
 
-        # 응답 저장
-        if db and result.get('message'):
-            try:
-                db.save_chat_log(TEMP_USER_ID, result['message'], 'bot')
-            except:
-                pass
+        # 실패 응답 저장
+        elif result.get('message'):
+            save_chat_log_async(TEMP_USER_ID, result['message'], 'bot')
 
         return jsonify({
             "success": result['success'],
@@ -355,7 +598,7 @@ def execute_order():
         })
 
     except Exception as e:
-        print(f"주문 실행 오류: {str(e)}")
+        logger.exception("주문 실행 오류")
         return jsonify({
             "error": str(e),
             "message": "주문 실행에 실패했습니다."
@@ -370,19 +613,20 @@ def tts_api():
         text = data.get('text', '')
 
         if not text:
-            return jsonify({"error": "텍스트가 없습니다"}), 400
+            return json_bytes_response(NO_TEXT_JSON, 400)
 
-        # gTTS로 음성 생성
-        audio_fp = text_to_speech(text)
+        # gTTS로 음성 생성 (생성되는 대로 스트리밍)
+        audio_stream = text_to_speech_stream(text)
+        first_chunk = next(audio_stream, b'')  # 첫 조각에서 생성 오류 확인
 
-        return send_file(
-            audio_fp,
-            mimetype='audio/mp3',
-            as_attachment=False
-        )
+        def generate():
+            yield first_chunk
+            yield from audio_stream
+
+        return Response(generate(), mimetype='audio/mp3')
 
     except Exception as e:
-        print(f"TTS 오류: {str(e)}")
+        logger.exception("TTS 오류")
         return jsonify({"error": str(e)}), 500
 
 
@@ -392,21 +636,33 @@ def health_check():
     status = {
         "status": "running",
         "clova_stt": bool(CLOVA_CLIENT_ID and CLOVA_CLIENT_SECRET),
-        "kis_api": kis_api is not None,
-        "database": db is not None and db.test_connection()
+        "kis_api": get_kis() is not None,
+        "database": check_database()
+    }
+
+    # 캐시 적중 통계
+    kis_api = get_kis()
+    status["cache"] = {
+        "stt": STT_CACHE.stats(),
+        "parse": PARSE_CACHE.stats(),
+        "gpt": GPT_CACHE.stats(),
+        "tts": TTS_CACHE.stats(),
+        "price": kis_api.price_cache.stats() if kis_api else None
     }
     return jsonify(status)
 
 
 # ===== 메인 실행 =====
+# 개발용 서버입니다. 운영 환경에서는 Gunicorn으로 실행하세요.
+#   gunicorn -c gunicorn.conf.py app:app
 if __name__ == '__main__':
     print("\n" + "=" * 70)
     print("AI 음성 주식매매 챗봇 서버 시작")
     print("=" * 70)
     print(f"서버 주소: http://localhost:5000")
     print(f"Clova STT: {'활성화' if CLOVA_CLIENT_ID else '비활성화'}")
-    print(f"한투 API: {'활성화' if kis_api else '비활성화'}")
-    print(f"데이터베이스: {'연결됨' if db else '연결 안됨'}")
+    print(f"한투 API: {'활성화' if get_kis() else '비활성화'}")
+    print(f"데이터베이스: {'연결됨' if get_db() else '연결 안됨'}")
     print("=" * 70 + "\n")
 
     # 서버 실행
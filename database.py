@@ -3,18 +3,67 @@ Supabase 데이터베이스 연동 클래스
 주문 내역, 채팅 로그 등을 저장 및 조회
 """
 
-from supabase import create_client, Client
-from typing import List, Dict, Optional
+# supabase(httpx, pydantic 등 포함)는 import가 무거우므로 Database 생성 시점에 import
+from typing import TYPE_CHECKING, List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import logging
 import os
+import threading
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Supabase REST(PostgREST) HTTP 연결 설정
+# HTTP/2로 요청 여러 개를 연결 하나에서 동시에 처리 (gevent 워커의 동시 요청 대응)
+SUPABASE_TIMEOUT = 15.0
+SUPABASE_MAX_CONNECTIONS = 60
+SUPABASE_MAX_KEEPALIVE = 30
+
+# 조회시 가져올 컬럼 (select("*") 대신 필요한 컬럼만)
+ORDER_COLUMNS = (
+    "id,stock_code,stock_name,action,quantity,price_type,order_price,"
+    "status,order_no,order_time,filled_price,filled_time"
+)
+CHAT_LOG_COLUMNS = "id,message,sender,timestamp"
+
+# 주문 통계 항목별 조건
+ORDER_STAT_FILTERS = {
+    "total_orders": {},
+    "buy_orders": {"action": "매수"},
+    "sell_orders": {"action": "매도"},
+    "completed_orders": {"status": "체결"},
+    "pending_orders": {"status": "대기"},
+    "canceled_orders": {"status": "취소"},
+}
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
 
 class Database:
     """Supabase 데이터베이스 클래스"""
 
+    @classmethod
+    def instance(cls) -> 'Database':
+        """프로세스 공용 인스턴스 (Supabase 클라이언트를 한 번만 생성)
+
+        생성에 실패하면 예외가 발생하고, 다음 호출에서 다시 시도합니다.
+        """
+        global _instance
+
+        if _instance is None:
+            with _instance_lock:
+                if _instance is None:
+                    _instance = cls()
+        return _instance
+
     def __init__(self):
         """Supabase 클라이언트 초기화"""
         url = os.getenv('SUPABASE_URL')
@@ -23,18 +72,59 @@ class Database:
         if not url or not key:
             raise ValueError("Supabase URL과 KEY가 .env 파일에 설정되어 있지 않습니다.")
         
-        self.supabase: Client = create_client(url, key)
-        print("Supabase 연결 성공")
+        from supabase import create_client
+        from supabase.lib.client_options import ClientOptions
+
+        self.supabase: 'Client' = create_client(
+            url, key, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT)
+        )
+        self._tuned_postgrest = None
+        self._tune_lock = threading.Lock()
+        self._tune_http_client()
+        logger.info("Supabase 연결 성공")
+
+    def _tune_http_client(self) -> None:
+        """PostgREST HTTP 클라이언트를 연결 풀/HTTP2 설정된 클라이언트로 교체
+
+        supabase-py 2.3은 httpx 클라이언트를 옵션으로 받지 않으므로 생성 후 교체합니다.
+        인증 이벤트(SIGNED_IN, TOKEN_REFRESHED, SIGNED_OUT) 때 PostgREST 클라이언트가
+        기본 설정으로 다시 만들어지므로 _client()에서 확인 후 다시 교체합니다.
+        """
+        import httpx
+        from postgrest.utils import SyncClient
+
+        postgrest = self.supabase.postgrest
+        session = postgrest.session
+        postgrest.session = SyncClient(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=session.timeout,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE
+            ),
+            http2=True
+        )
+        session.close()
+        self._tuned_postgrest = postgrest
+
+    def _client(self) -> 'Client':
+        """쿼리용 Supabase 클라이언트 (PostgREST 클라이언트가 새로 만들어졌으면 다시 튜닝)"""
+        if self.supabase.postgrest is not self._tuned_postgrest:
+            with self._tune_lock:
+                if self.supabase.postgrest is not self._tuned_postgrest:
+                    self._tune_http_client()
+        return self.supabase
 
     def test_connection(self) -> bool:
         """데이터베이스 연결 테스트"""
         try:
             # users 테이블에서 1개 행만 조회
-            response = self.supabase.table('users').select("*").limit(1).execute()
-            print("데이터베이스 연결 테스트 성공")
+            response = self._client().table('users').select("id").limit(1).execute()
+            logger.debug("데이터베이스 연결 테스트 성공")
             return True
-        except Exception as e:
-            print(f"데이터베이스 연결 실패: {str(e)}")
+        except Exception:
+            logger.exception("데이터베이스 연결 실패")
             return False
 
     # ===== 사용자 관련 =====
@@ -42,23 +132,23 @@ class Database:
     def create_user(self, username: str) -> int:
         """사용자 생성"""
         try:
-            response = self.supabase.table('users').insert({
+            response = self._client().table('users').insert({
                 'username': username
             }).execute()
             return response.data[0]['id']
-        except Exception as e:
-            print(f"사용자 생성 오류: {str(e)}")
+        except Exception:
+            logger.exception("사용자 생성 오류")
             return None
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """사용자 조회"""
         try:
-            response = self.supabase.table('users').select("*").eq('id', user_id).execute()
+            response = self._client().table('users').select("*").eq('id', user_id).execute()
             if response.data:
                 return response.data[0]
             return None
-        except Exception as e:
-            print(f"사용자 조회 오류: {str(e)}")
+        except Exception:
+            logger.exception("사용자 조회 오류")
             return None
 
     # ===== 주문 관련 =====
@@ -66,7 +156,7 @@ class Database:
     def save_order(self, user_id: int, order_data: Dict) -> int:
         """주문 내역 저장"""
         try:
-            response = self.supabase.table('orders').insert({
+            response = self._client().table('orders').insert({
                 'user_id': user_id,
                 'stock_code': order_data.get('stock_code', ''),
                 'stock_name': order_data.get('stock_name', ''),
@@ -78,9 +168,41 @@ class Database:
                 'order_no': order_data.get('order_no', '')
             }).execute()
             return response.data[0]['id']
-        except Exception as e:
-            print(f"주문 저장 오류: {str(e)}")
+        except Exception:
+            logger.exception("주문 저장 오류")
+            return None
+
+    def save_order_and_log(self, user_id: int, order_data: Dict,
+                           message: str) -> Optional[Dict]:
+        """주문 내역과 봇 응답 로그를 한 번에 저장 (RPC: save_order_with_log)
+
+        한 트랜잭션으로 처리되어 요청 1회로 두 테이블에 저장됩니다.
+        RPC 함수가 없으면 각각 저장합니다. (sql/001_save_order_with_log.sql)
+
+        Returns:
+            dict: {"order_id": 주문ID, "chat_log_id": 로그ID}, 실패시 None
+        """
+        try:
+            response = self._client().rpc('save_order_with_log', {
+                'p_user_id': user_id,
+                'p_stock_code': order_data.get('stock_code', ''),
+                'p_stock_name': order_data.get('stock_name', ''),
+                'p_action': order_data.get('action', ''),
+                'p_quantity': order_data.get('quantity', 0),
+                'p_price_type': order_data.get('price_type', '시장가'),
+                'p_order_price': order_data.get('order_price', 0),
+                'p_order_no': order_data.get('order_no', ''),
+                'p_message': message
+            }).execute()
+            return response.data
+        except Exception:
+            logger.exception("주문/로그 일괄 저장 오류, 개별 저장")
+
+        order_id = self.save_order(user_id, order_data)
+        chat_log_id = self.save_chat_log(user_id, message, 'bot')
+        if order_id is None:
             return None
+        return {"order_id": order_id, "chat_log_id": chat_log_id}
 
     def update_order_status(self, order_id: int, status: str,
                            filled_price: Optional[float] = None) -> bool:
@@ -92,45 +214,59 @@ class Database:
                 update_data['filled_price'] = filled_price
                 update_data['filled_time'] = datetime.now().isoformat()
             
-            response = self.supabase.table('orders').update(update_data).eq('id', order_id).execute()
+            response = self._client().table('orders').update(update_data).eq('id', order_id).execute()
             return len(response.data) > 0
-        except Exception as e:
-            print(f"주문 상태 업데이트 오류: {str(e)}")
+        except Exception:
+            logger.exception("주문 상태 업데이트 오류")
             return False
 
-    def get_user_orders(self, user_id: int, limit: int = 10) -> List[Dict]:
-        """사용자 주문 내역 조회"""
+    def get_user_orders(self, user_id: int, limit: int = 10,
+                        fields: str = ORDER_COLUMNS) -> List[Dict]:
+        """사용자 주문 내역 조회 (최신순, 인덱스: ix_orders_user_time)
+
+        Args:
+            user_id: 사용자 ID
+            limit: 최대 조회 개수
+            fields: 가져올 컬럼 (쉼표로 구분, 예: "stock_name,action,quantity")
+        """
         try:
-            response = self.supabase.table('orders').select("*").eq(
+            response = self._client().table('orders').select(fields).eq(
                 'user_id', user_id
             ).order('order_time', desc=True).limit(limit).execute()
             return response.data
-        except Exception as e:
-            print(f"주문 조회 오류: {str(e)}")
+        except Exception:
+            logger.exception("주문 조회 오류")
             return []
 
-    def get_order_by_id(self, order_id: int) -> Optional[Dict]:
+    def get_order_by_id(self, order_id: int, fields: str = ORDER_COLUMNS) -> Optional[Dict]:
         """주문 조회"""
         try:
-            response = self.supabase.table('orders').select("*").eq('id', order_id).execute()
+            response = self._client().table('orders').select(fields).eq('id', order_id).execute()
             if response.data:
                 return response.data[0]
             return None
-        except Exception as e:
-            print(f"주문 조회 오류: {str(e)}")
+        except Exception:
+            logger.exception("주문 조회 오류")
             return None
 
-    def get_orders_by_stock(self, user_id: int, stock_code: str) -> List[Dict]:
-        """특정 종목의 주문 내역 조회"""
+    def get_orders_by_stock(self, user_id: int, stock_code: str,
+                            fields: str = ORDER_COLUMNS) -> List[Dict]:
+        """특정 종목의 주문 내역 조회 (최신순, 인덱스: ix_orders_user_stock_time)
+
+        Args:
+            user_id: 사용자 ID
+            stock_code: 종목코드
+            fields: 가져올 컬럼 (쉼표로 구분)
+        """
         try:
-            response = self.supabase.table('orders').select("*").eq(
+            response = self._client().table('orders').select(fields).eq(
                 'user_id', user_id
             ).eq(
                 'stock_code', stock_code
             ).order('order_time', desc=True).execute()
             return response.data
-        except Exception as e:
-            print(f"종목별 주문 조회 오류: {str(e)}")
+        except Exception:
+            logger.exception("종목별 주문 조회 오류")
             return []
 
     # ===== 채팅 로그 관련 =====
@@ -138,75 +274,115 @@ class Database:
     def save_chat_log(self, user_id: int, message: str, sender: str) -> int:
         """채팅 로그 저장"""
         try:
-            response = self.supabase.table('chat_logs').insert({
+            response = self._client().table('chat_logs').insert({
                 'user_id': user_id,
                 'message': message,
                 'sender': sender
             }).execute()
             return response.data[0]['id']
-        except Exception as e:
-            print(f"채팅 로그 저장 오류: {str(e)}")
+        except Exception:
+            logger.exception("채팅 로그 저장 오류")
             return None
 
+    def save_chat_logs(self, logs: List[Dict]) -> int:
+        """채팅 로그 여러 개를 한 번에 저장
+
+        Args:
+            logs: [{"user_id": 사용자ID, "message": 메시지, "sender": 발신자}, ...]
+
+        Returns:
+            int: 저장된 로그 수
+        """
+        if not logs:
+            return 0
+
+        try:
+            response = self._client().table('chat_logs').insert([
+                {
+                    'user_id': log['user_id'],
+                    'message': log['message'],
+                    'sender': log['sender']
+                }
+                for log in logs
+            ]).execute()
+            return len(response.data)
+        except Exception:
+            logger.exception("채팅 로그 일괄 저장 오류")
+            return 0
+
     def get_chat_history(self, user_id: int, limit: int = 50) -> List[Dict]:
-        """채팅 기록 조회"""
+        """최근 채팅 기록 조회 (오래된 순으로 반환, 인덱스: ix_chat_logs_user_ts)"""
         try:
-            response = self.supabase.table('chat_logs').select("*").eq(
+            # 최신순으로 limit개를 가져온 뒤 시간순으로 뒤집음
+            response = self._client().table('chat_logs').select(CHAT_LOG_COLUMNS).eq(
                 'user_id', user_id
-            ).order('timestamp', desc=False).limit(limit).execute()
-            return response.data
-        except Exception as e:
-            print(f"채팅 기록 조회 오류: {str(e)}")
+            ).order('timestamp', desc=True).limit(limit).execute()
+            return response.data[::-1]
+        except Exception:
+            logger.exception("채팅 기록 조회 오류")
             return []
 
     def delete_old_chat_logs(self, days: int = 30) -> int:
-        """오래된 채팅 로그 삭제"""
+        """오래된 채팅 로그 삭제 (RPC: purge_old_chat_logs, 수동 실행용)
+
+        평소에는 DB의 pg_cron 작업이 매일 삭제합니다. 삭제된 행 대신 건수만 받습니다.
+        RPC 함수가 없으면 직접 삭제합니다. (sql/005_purge_chat_logs.sql)
+        """
+        try:
+            response = self._client().rpc('purge_old_chat_logs', {
+                'p_days': days
+            }).execute()
+            return response.data or 0
+        except Exception:
+            logger.exception("채팅 로그 삭제 RPC 오류, 직접 삭제")
+
         try:
             from datetime import datetime, timedelta
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             
-            response = self.supabase.table('chat_logs').delete().lt(
+            response = self._client().table('chat_logs').delete().lt(
                 'timestamp', cutoff_date
             ).execute()
             return len(response.data)
-        except Exception as e:
-            print(f"채팅 로그 삭제 오류: {str(e)}")
+        except Exception:
+            logger.exception("채팅 로그 삭제 오류")
             return 0
 
     # ===== 통계 =====
 
     def get_order_statistics(self, user_id: int) -> Dict:
-        """주문 통계 조회"""
+        """주문 통계 조회 (RPC: get_order_stats)
+
+        집계는 DB에서 처리하고 건수만 받습니다.
+        RPC 함수가 없으면 항목별 건수를 따로 조회합니다. (sql/003_get_order_stats.sql)
+        """
         try:
-            # 전체 주문 조회
-            response = self.supabase.table('orders').select("*").eq('user_id', user_id).execute()
-            orders = response.data
-            
-            if not orders:
-                return {
-                    "total_orders": 0,
-                    "buy_orders": 0,
-                    "sell_orders": 0,
-                    "completed_orders": 0,
-                    "pending_orders": 0,
-                    "canceled_orders": 0
-                }
-            
-            # 통계 계산
-            stats = {
-                "total_orders": len(orders),
-                "buy_orders": len([o for o in orders if o['action'] == '매수']),
-                "sell_orders": len([o for o in orders if o['action'] == '매도']),
-                "completed_orders": len([o for o in orders if o['status'] == '체결']),
-                "pending_orders": len([o for o in orders if o['status'] == '대기']),
-                "canceled_orders": len([o for o in orders if o['status'] == '취소'])
-            }
-            
-            return stats
-        except Exception as e:
-            print(f"통계 조회 오류: {str(e)}")
+            response = self._client().rpc('get_order_stats', {
+                'p_user_id': user_id
+            }).execute()
+            return response.data
+        except Exception:
+            logger.exception("주문 통계 RPC 오류, 직접 계산")
+
+        try:
+            # 항목별 건수만 동시 조회 (count='exact', 행 데이터는 받지 않음)
+            with ThreadPoolExecutor(max_workers=len(ORDER_STAT_FILTERS)) as executor:
+                counts = executor.map(
+                    lambda f: self._count_orders(user_id, f),
+                    ORDER_STAT_FILTERS.values()
+                )
+                return dict(zip(ORDER_STAT_FILTERS, counts))
+        except Exception:
+            logger.exception("통계 조회 오류")
             return {}
 
+    def _count_orders(self, user_id: int, filters: Dict) -> int:
+        """조건에 맞는 주문 건수 (Content-Range 헤더의 전체 건수 사용)"""
+        query = self._client().table('orders').select('id', count='exact').eq('user_id', user_id)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return query.limit(1).execute().count or 0
+
 
 # ===== 테스트 함수 =====
 def test_database():
@@ -217,7 +393,7 @@ def test_database():
     
     try:
         # Database 인스턴스 생성
-        db = Database()
+        db = Database.instance()
         
         # 연결 테스트
         if db.test_connection():
@@ -1,21 +1,24 @@
 """
 GPT를 사용한 주식 명령어 파싱
 """
-import os
-import openai
-from dotenv import load_dotenv
+import logging
 
-# 환경변수 로드
-load_dotenv()
+import orjson
+
+# 규칙 기반 파서와 GPT 호출(프롬프트, 공유 세션, 응답 캐시)은 parser 모듈 것을 사용
+from parser import (
+    parse_command_original, is_complete_command, get_openai, ask_gpt,
+    GPT_MODEL
+)
+
+logger = logging.getLogger(__name__)
 
-# OpenAI API 키 설정
-openai.api_key = os.getenv('OPENAI_API_KEY')
 
 def test_gpt_connection():
     """GPT API 연결 테스트"""
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
+        response = get_openai().ChatCompletion.create(
+            model=GPT_MODEL,
             messages=[
                 {"role": "user", "content": "안녕하세요"}
             ],
@@ -31,36 +34,37 @@ def test_gpt_connection():
         print(f"❌ GPT API 연결 실패: {str(e)}")
         return False
 
+def format_parsed_command(parsed):
+    """규칙 기반 파싱 결과를 GPT 응답 형식(JSON)으로 변환"""
+    if parsed["type"] == "trade":
+        action = parsed["action"]
+        quantity = parsed["quantity"]
+    else:
+        action = parsed["query_type"]
+        quantity = 0
+
+    return orjson.dumps({
+        "action": action,
+        "stock": parsed.get('stock'),
+        "quantity": quantity
+    }).decode()
+
+
 def parse_stock_command(text):
-    """GPT로 주식 명령어 파싱"""
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": """
-당신은 주식 거래 명령어를 분석하는 AI입니다.
-사용자의 자연어 명령을 분석해서 다음 정보를 추출하세요:
-- 행동: 매수, 매도, 현재가조회, 잔고조회, 보유종목조회
-- 종목명: 삼성전자, SK하이닉스, 네이버, 카카오 등 (정확한 이름으로 변환)
-- 수량: 숫자 (없으면 0)
+    """GPT로 주식 명령어 파싱 (규칙 기반 파서로 처리되면 GPT 호출 생략)"""
+    parsed = parse_command_original(text)
+    if is_complete_command(parsed):
+        result = format_parsed_command(parsed)
+        logger.debug("규칙 기반 분석 결과:\n%s", result)
+        return result
 
-응답 형식:
-행동: [매수/매도/현재가/잔고/보유종목]
-종목: [종목명]
-수량: [숫자]
-"""},
-                {"role": "user", "content": text}
-            ],
-            max_tokens=100,
-            temperature=0.3
-        )
-        
-        result = response.choices[0].message.content
-        print(f"GPT 분석 결과:\n{result}")
+    try:
+        result = ask_gpt(text)
+        logger.debug("GPT 분석 결과:\n%s", result)
         return result
         
-    except Exception as e:
-        print(f"GPT 파싱 오류: {str(e)}")
+    except Exception:
+        logger.exception("GPT 파싱 오류")
         return None
 
 
@@ -80,5 +84,5 @@ if __name__ == "__main__":
     
     for test in test_cases:
         print(f"\n입력: {test}")
-        parse_stock_command(test)
+        print(parse_stock_command(test))
         print("-" * 30)
\ No newline at end of file
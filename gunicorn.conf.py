@@ -0,0 +1,68 @@
+"""
+Gunicorn 설정 파일
+실행: gunicorn -c gunicorn.conf.py app:app
+
+모든 API가 외부 서비스(Clova, 한투, Supabase, gTTS) 응답을 기다리는
+I/O 작업이므로 gevent 비동기 워커로 동시 요청을 처리합니다.
+"""
+import multiprocessing
+import os
+import threading
+
+from logging_config import setup_logging
+
+# 마스터 프로세스는 fork 전이므로 스레드 없이 바로 출력
+setup_logging(use_queue=False)
+
+# 바인딩 주소 (nginx 뒤에 둘 경우 unix:/tmp/gunicorn.sock, nginx.conf 참고)
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# 워커 설정: (2 * CPU) + 1, 워커당 동시 연결 1000개
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gevent'
+worker_connections = 1000
+
+# 마스터에서 앱 코드를 한 번만 import하고 워커는 fork로 공유 (copy-on-write)
+# 한투 토큰, DB 클라이언트는 워커별로 첫 요청에서 생성 (app.get_kis, app.get_db)
+preload_app = True
+
+# 외부 API 응답 대기 시간을 고려한 타임아웃
+timeout = 60
+# nginx upstream keepalive 연결이 끊기지 않도록 nginx보다 길게
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
+
+# 로그는 표준 출력으로
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """워커마다 로그 출력 스레드 시작 (fork시 스레드는 복사되지 않음)"""
+    setup_logging()
+
+    # 한투 API 요청 제한을 워커 수로 나누도록 실제 워커 수 전달 (kis_api.rate_limit_per_worker)
+    os.environ['GUNICORN_WORKERS'] = str(server.num_workers)
+
+    # 고정 음성 응답을 백그라운드에서 미리 생성
+    # gTTS는 타임아웃이 없으므로 요청 처리를 막지 않도록 별도 스레드(gevent에서는 greenlet)로 실행
+    if os.getenv('TTS_WARMUP') == '1':
+        threading.Thread(target=_warm_tts_cache, args=(worker.log,), daemon=True).start()
+
+
+def _warm_tts_cache(log):
+    """고정 음성 응답을 TTS 캐시에 저장 (워커별 메모리 캐시 + 공유 디스크 캐시)"""
+    from app import FIXED_SPOKEN_REPLIES
+    from stt_tts import warm_tts_cache
+
+    ready = warm_tts_cache(FIXED_SPOKEN_REPLIES)
+    log.info("TTS 캐시 준비: %d/%d", ready, len(FIXED_SPOKEN_REPLIES))
+
+
+def when_ready(server):
+    """앱 로드(gevent 패치) 후 무거운 모듈을 마스터에서 미리 import
+
+    앱 코드는 supabase/openai를 사용 시점에 import합니다. (개발 서버 시작 시간 단축)
+    운영 서버는 fork 전에 import해 두어 워커의 첫 요청이 기다리지 않게 합니다.
+    """
+    import openai  # noqa: F401
+    import supabase  # noqa: F401
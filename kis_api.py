@@ -3,11 +3,159 @@
 실제 주식 매매 및 조회를 위한 API 연동
 """
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import hashlib
 import json
-from typing import Dict, Optional
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows (개발 서버는 단일 프로세스이므로 파일 잠금 불필요)
+    fcntl = None
+
+from cache import LRUCache
+from stock_names import STOCK_CODE_TO_NAME
+
+logger = logging.getLogger(__name__)
+
+# 토큰 캐시 (앱키+서버별, 약 24시간 유효하므로 프로세스/인스턴스 간 재사용)
+# {캐시키: {"access_token": 토큰, "expires_at": 만료시각(time.time 기준)}}
+_TOKEN_CACHE: Dict[str, Dict] = {}
+_TOKEN_LOCK = threading.Lock()
+TOKEN_CACHE_DIR = os.getenv('KIS_TOKEN_CACHE_DIR', os.path.expanduser('~'))
+TOKEN_EXPIRY_MARGIN = 300  # 만료 5분 전 재발급
+TOKEN_LOCK_TIMEOUT = 15.0  # 다른 워커의 토큰 발급을 기다리는 최대 시간(초)
+HOLDINGS_CACHE_TTL = 5.0  # 보유수량 캐시 유지 시간(초)
+PRICE_CACHE_TTL = 2.0  # 현재가 캐시 유지 시간(초)
+
+# 초당 요청 수 제한 (한투 API는 앱키당 초당 20건, 여유를 두고 18건)
+APP_KEY_RATE_LIMIT = 18.0
+REQUEST_TIMEOUT = 10
+
+
+def rate_limit_per_worker() -> float:
+    """워커 프로세스 1개의 초당 요청 수
+
+    제한은 프로세스마다 따로 적용되므로 앱키 한도를 워커 수로 나눕니다.
+    워커 수는 gunicorn.conf.py의 post_fork가 GUNICORN_WORKERS에 넣어 줍니다. (개발 서버는 1)
+    KIS_RATE_LIMIT을 설정하면 그 값을 그대로 사용합니다.
+    """
+    rate = os.getenv('KIS_RATE_LIMIT')
+    if rate:
+        return float(rate)
+
+    workers = max(1, int(os.getenv('GUNICORN_WORKERS', '1')))
+    return APP_KEY_RATE_LIMIT / workers
+
+
+class TokenBucket:
+    """토큰 버킷 방식 요청 속도 제한 (초과시 토큰이 생길 때까지 대기)"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 초당 허용 요청 수
+            capacity: 순간 최대 요청 수 (기본값: rate, 최소 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """요청 1건 허용될 때까지 대기"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+@contextmanager
+def _token_file_lock(path: str) -> Iterator[None]:
+    """토큰 발급 프로세스 간 잠금 (gunicorn 워커들이 동시에 발급하지 않도록)
+
+    gevent 워커가 멈추지 않도록 블로킹 대기 대신 잠금을 짧게 반복 시도합니다.
+    잠금 파일을 열 수 없거나 대기 시간을 넘기면 잠금 없이 진행합니다.
+    """
+    fd = None
+    locked = False
+    try:
+        if fcntl is not None:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            deadline = time.monotonic() + TOKEN_LOCK_TIMEOUT
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning("토큰 발급 잠금 대기 시간 초과, 잠금 없이 진행")
+                        break
+                    time.sleep(0.05)
+    except OSError:
+        logger.warning("토큰 발급 잠금 파일 오류, 잠금 없이 진행", exc_info=True)
+
+    try:
+        yield
+    finally:
+        if fd is not None:
+            if locked:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _to_int(value) -> int:
+    """API 숫자 문자열을 정수로 변환 ("65000.0000" 같은 소수 표기 포함)"""
+    return int(float(value))
+
+
+# 응답 필드 변환 규칙: (결과 키, API 필드, 변환 함수, 기본값)
+BALANCE_FIELDS = (
+    ("deposit", "dnca_tot_amt", _to_int, 0),  # 예수금
+    ("total_value", "tot_evlu_amt", _to_int, 0),  # 총평가금액
+    ("profit_loss", "evlu_pfls_smtl_amt", _to_int, 0),  # 평가손익
+    ("profit_rate", "tot_evlu_pfls_rt", float, 0),  # 수익률
+)
+
+HOLDING_FIELDS = (
+    ("stock_name", "prdt_name", str, ""),  # 종목명
+    ("stock_code", "pdno", str, ""),  # 종목코드
+    ("quantity", "hldg_qty", _to_int, 0),  # 보유수량
+    ("avg_price", "pchs_avg_pric", _to_int, 0),  # 평균매입가
+    ("current_price", "prpr", _to_int, 0),  # 현재가
+    ("profit_loss", "evlu_pfls_amt", _to_int, 0),  # 평가손익
+    ("profit_rate", "evlu_pfls_rt", float, 0),  # 수익률
+)
+
+
+def _convert_fields(item: Dict, fields: tuple) -> Dict:
+    """변환 규칙에 따라 API 응답 항목을 결과 딕셔너리로 변환"""
+    return {key: cast(item.get(src, default)) for key, src, cast, default in fields}
+
 
 class KISApi:
     """한국투자증권 API 클래스"""
@@ -34,12 +182,119 @@ class KISApi:
             self.base_url = "https://openapivts.koreainvestment.com:29443"
 
         self.access_token = None
+        self.token_expires_at = 0.0
+
+        # 현재가 캐시 (같은 종목 반복 조회시 API 호출 생략, 호출 한도 보호)
+        self.price_cache = LRUCache(maxsize=1024, ttl=PRICE_CACHE_TTL)
+
+        # 보유수량 캐시 {종목코드: 수량} (전량 매도시 잔고 재조회 방지)
+        self._holdings_cache: Dict[str, int] = {}
+        self._holdings_cached_at = None
+
+        # HTTP 세션 (연결 재사용으로 매 요청마다 TCP/TLS 연결하지 않음)
+        # 재시도는 연결 실패와 일시적 서버 오류(502/503/504)
+        # POST 주문은 urllib3 기본값상 응답을 받은 뒤에는 재전송 안함 (중복 주문 방지)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=50,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.1,
+                status_forcelist=[502, 503, 504],
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # 요청 속도 제한 (호출 한도 초과 오류와 재시도 방지)
+        self.rate_limiter = TokenBucket(rate_limit_per_worker())
 
         # 토큰 발급
         self._get_access_token()
 
+    def __del__(self):
+        """세션 연결 정리"""
+        session = getattr(self, 'session', None)
+        if session is not None:
+            session.close()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """한투 API HTTP 요청 (속도 제한 적용, 세션 연결 재사용)"""
+        self.rate_limiter.acquire()
+        return self.session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+
+    def _token_cache_key(self) -> str:
+        """토큰 캐시 키 (앱키와 서버 주소 해시)"""
+        return hashlib.sha256(
+            f"{self.app_key}|{self.base_url}".encode('utf-8')
+        ).hexdigest()[:16]
+
+    def _token_cache_path(self) -> str:
+        """토큰 캐시 파일 경로"""
+        return os.path.join(TOKEN_CACHE_DIR, f".kis_token_{self._token_cache_key()}.json")
+
+    def _load_cached_token(self) -> Optional[Dict]:
+        """메모리 → 파일 순으로 만료되지 않은 토큰 조회"""
+        key = self._token_cache_key()
+        cached = _TOKEN_CACHE.get(key)
+        if cached and time.time() < cached["expires_at"]:
+            return cached
+
+        try:
+            with open(self._token_cache_path(), 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if time.time() < cached["expires_at"]:
+                _TOKEN_CACHE[key] = cached
+                return cached
+        except (OSError, ValueError, KeyError):
+            pass
+
+        return None
+
+    def _save_cached_token(self, cached: Dict) -> None:
+        """토큰을 메모리와 파일에 저장 (파일 저장 실패는 무시)"""
+        _TOKEN_CACHE[self._token_cache_key()] = cached
+
+        path = self._token_cache_path()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning("토큰 캐시 저장 실패", exc_info=True)
+
     def _get_access_token(self) -> None:
-        """OAuth 토큰 발급"""
+        """OAuth 토큰 발급 (캐시된 토큰이 유효하면 재사용)
+
+        스레드 간에는 _TOKEN_LOCK, 워커 프로세스 간에는 토큰 캐시 파일 옆의 잠금 파일로
+        발급을 직렬화합니다. 잠금을 얻은 뒤 캐시를 다시 확인하므로
+        먼저 발급한 워커의 토큰을 나머지 워커가 그대로 사용합니다.
+        """
+        with _TOKEN_LOCK:
+            if self._use_cached_token():
+                return
+
+            with _token_file_lock(f"{self._token_cache_path()}.lock"):
+                if self._use_cached_token():
+                    return
+                self._issue_access_token()
+
+    def _use_cached_token(self) -> bool:
+        """캐시된 토큰이 유효하면 적용"""
+        cached = self._load_cached_token()
+        if not cached:
+            return False
+
+        self.access_token = cached["access_token"]
+        self.token_expires_at = cached["expires_at"]
+        return True
+
+    def _issue_access_token(self) -> None:
+        """토큰 발급 API 호출 (실패시 예외)"""
         url = f"{self.base_url}/oauth2/tokenP"
 
         headers = {"content-type": "application/json"}
@@ -50,17 +305,23 @@ class KISApi:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=body, timeout=10)
+            response = self._request('POST', url, headers=headers, json=body)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 self.access_token = data["access_token"]
-                print("한국투자증권 API 토큰 발급 완료")
+                expires_in = int(data.get("expires_in", 86400))
+                self.token_expires_at = time.time() + expires_in - TOKEN_EXPIRY_MARGIN
+                self._save_cached_token({
+                    "access_token": self.access_token,
+                    "expires_at": self.token_expires_at
+                })
+                logger.debug("한국투자증권 API 토큰 발급 완료")
             else:
                 raise Exception(f"토큰 발급 실패: {response.text}")
 
-        except Exception as e:
-            print(f"토큰 발급 오류: {str(e)}")
+        except Exception:
+            logger.exception("토큰 발급 오류")
             raise
 
     def _get_headers(self, tr_id: str) -> Dict:
@@ -72,6 +333,10 @@ class KISApi:
         Returns:
             dict: 헤더 딕셔너리
         """
+        # 토큰 만료시 재발급
+        if time.time() >= self.token_expires_at:
+            self._get_access_token()
+
         return {
             "authorization": f"Bearer {self.access_token}",
             "appkey": self.app_key,
@@ -81,7 +346,7 @@ class KISApi:
         }
 
     def get_current_price(self, stock_code: str) -> Dict:
-        """주식 현재가 조회
+        """주식 현재가 조회 (2초 내 같은 종목은 캐시 사용, 성공 결과만 저장)
     
         Args:
             stock_code: 종목코드 (예: "005930")
@@ -96,6 +361,17 @@ class KISApi:
                 "volume": 거래량
             }
         """
+        result = self.price_cache.get(stock_code)
+
+        if result is None:
+            result = self._fetch_current_price(stock_code)
+            if result['success']:
+                self.price_cache.set(stock_code, result)
+
+        return result
+
+    def _fetch_current_price(self, stock_code: str) -> Dict:
+        """주식 현재가 API 호출"""
         url = f"{self.base_url}/uapi/domestic-stock/v1/quotations/inquire-price"
     
         tr_id = "FHKST01010100"
@@ -107,16 +383,16 @@ class KISApi:
         }
     
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._request('GET', url, headers=headers, params=params)
     
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
     
                 if data["rt_cd"] == "0":  # 성공
                     output = data["output"]
                     return {
                         "success": True,
-                        "stock_name": output.get("prdt_name", output.get("hts_kor_isnm", "종목명")),
+                        "stock_name": output.get("prdt_name") or output.get("hts_kor_isnm") or self.resolve_name(stock_code),
                         "current_price": int(output.get("stck_prpr", 0)),
                         "change": int(output.get("prdy_vrss", 0)),
                         "change_rate": float(output.get("prdy_ctrt", 0)),
@@ -139,6 +415,32 @@ class KISApi:
                 "message": f"네트워크 오류: {str(e)}"
             }
 
+    def resolve_name(self, stock_code: str) -> str:
+        """종목코드 → 종목명 (종목 데이터에 없으면 종목코드 그대로)"""
+        return STOCK_CODE_TO_NAME.get(stock_code, stock_code)
+
+    def bulk_current_prices(self, stock_codes: List[str],
+                            max_workers: int = 10) -> Dict[str, Dict]:
+        """여러 종목 현재가 동시 조회
+
+        세션 연결 풀(최대 50개)을 공유하며 종목별로 병렬 요청합니다.
+        (gevent 워커에서는 스레드가 greenlet으로 동작)
+
+        Args:
+            stock_codes: 종목코드 리스트
+            max_workers: 동시 요청 수
+
+        Returns:
+            dict: {종목코드: get_current_price 결과, ...}
+        """
+        codes = list(dict.fromkeys(stock_codes))  # 중복 제거 (순서 유지)
+        if not codes:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(codes))) as executor:
+            results = executor.map(self.get_current_price, codes)
+            return dict(zip(codes, results))
+
     def buy_stock(self, stock_code: str, quantity: int,
                   order_type: str = "시장가", price: int = 0) -> Dict:
         """주식 매수 주문
@@ -184,12 +486,13 @@ class KISApi:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=body, timeout=10)
+            response = self._request('POST', url, headers=headers, json=body)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
 
                 if data["rt_cd"] == "0":  # 성공
+                    self._holdings_cached_at = None  # 보유수량 변경
                     return {
                         "success": True,
                         "order_no": data["output"]["ODNO"],
@@ -231,22 +534,17 @@ class KISApi:
         """
         # 전량 매도인 경우 보유 수량 조회
         if quantity == -1:
-            holdings = self.get_holdings()
-            if holdings["success"]:
-                for stock in holdings["holdings"]:
-                    if stock["stock_code"] == stock_code:
-                        quantity = stock["quantity"]
-                        break
-                else:
-                    return {
-                        "success": False,
-                        "message": "해당 종목을 보유하고 있지 않습니다."
-                    }
-            else:
+            quantity = self.get_holding_qty(stock_code)
+            if quantity is None:
                 return {
                     "success": False,
                     "message": "보유 종목 조회에 실패했습니다."
                 }
+            if quantity == 0:
+                return {
+                    "success": False,
+                    "message": "해당 종목을 보유하고 있지 않습니다."
+                }
 
         url = f"{self.base_url}/uapi/domestic-stock/v1/trading/order-cash"
 
@@ -276,12 +574,13 @@ class KISApi:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=body, timeout=10)
+            response = self._request('POST', url, headers=headers, json=body)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
 
                 if data["rt_cd"] == "0":
+                    self._holdings_cached_at = None  # 보유수량 변경
                     return {
                         "success": True,
                         "order_no": data["output"]["ODNO"],
@@ -337,20 +636,15 @@ class KISApi:
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._request('GET', url, headers=headers, params=params)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
 
                 if data["rt_cd"] == "0":
-                    output = data["output"]
-                    return {
-                        "success": True,
-                        "deposit": int(output.get("dnca_tot_amt", 0)),  # 예수금
-                        "total_value": int(output.get("tot_evlu_amt", 0)),  # 총평가금액
-                        "profit_loss": int(output.get("evlu_pfls_smtl_amt", 0)),  # 평가손익
-                        "profit_rate": float(output.get("tot_evlu_pfls_rt", 0))  # 수익률
-                    }
+                    result = {"success": True}
+                    result.update(_convert_fields(data["output"], BALANCE_FIELDS))
+                    return result
                 else:
                     return {
                         "success": False,
@@ -414,26 +708,22 @@ class KISApi:
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._request('GET', url, headers=headers, params=params)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
 
                 if data["rt_cd"] == "0":
                     holdings = []
 
                     for item in data["output1"]:
-                        qty = int(item.get("hldg_qty", 0))
-                        if qty > 0:  # 보유수량이 있는 것만
-                            holdings.append({
-                                "stock_name": item.get("prdt_name", ""),  # 종목명
-                                "stock_code": item.get("pdno", ""),  # 종목코드
-                                "quantity": qty,  # 보유수량
-                                "avg_price": int(item.get("pchs_avg_pric", 0)),  # 평균매입가
-                                "current_price": int(item.get("prpr", 0)),  # 현재가
-                                "profit_loss": int(item.get("evlu_pfls_amt", 0)),  # 평가손익
-                                "profit_rate": float(item.get("evlu_pfls_rt", 0))  # 수익률
-                            })
+                        holding = _convert_fields(item, HOLDING_FIELDS)
+                        if holding["quantity"] > 0:  # 보유수량이 있는 것만
+                            holdings.append(holding)
+
+                    # 전량 매도용 보유수량 캐시 갱신
+                    self._holdings_cache = {h["stock_code"]: h["quantity"] for h in holdings}
+                    self._holdings_cached_at = time.monotonic()
 
                     return {
                         "success": True,
@@ -457,6 +747,22 @@ class KISApi:
                 "message": f"네트워크 오류: {str(e)}"
             }
 
+    def get_holding_qty(self, stock_code: str) -> Optional[int]:
+        """종목 보유수량 조회 (최근 5초 내 보유종목 조회 결과 재사용)
+
+        Args:
+            stock_code: 종목코드
+
+        Returns:
+            int: 보유수량 (미보유시 0), 조회 실패시 None
+        """
+        cached_at = self._holdings_cached_at
+        if cached_at is None or time.monotonic() - cached_at > HOLDINGS_CACHE_TTL:
+            if not self.get_holdings()["success"]:
+                return None
+
+        return self._holdings_cache.get(stock_code, 0)
+
 
 # ===== 테스트 함수 =====
 def test_kis_api():
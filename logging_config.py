@@ -0,0 +1,61 @@
+"""
+로깅 설정 모듈
+요청 처리 스레드는 로그를 큐에 넣기만 하고, 출력은 별도 스레드(QueueListener)가 담당합니다.
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+
+_listener = None
+_handler = None
+_pid = None
+
+
+def setup_logging(level: str = None, use_queue: bool = True) -> None:
+    """루트 로거에 QueueHandler 연결 (프로세스별 1회)
+
+    Gunicorn이 fork한 워커에서는 리스너 스레드가 복사되지 않으므로
+    워커마다 다시 호출해야 합니다. (gunicorn.conf.py의 post_fork)
+
+    Args:
+        level: 로그 레벨 (기본값: 환경변수 LOG_LEVEL 또는 INFO)
+        use_queue: False면 스레드 없이 바로 출력 (fork 전 마스터 프로세스용)
+    """
+    global _listener, _handler, _pid
+
+    if _pid == os.getpid():
+        return
+
+    root = logging.getLogger()
+
+    # fork 이전 프로세스의 핸들러 제거
+    if _handler is not None:
+        root.removeHandler(_handler)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if use_queue:
+        log_queue = queue.Queue(-1)
+        _handler = QueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        _handler = stream_handler
+        _listener = None
+
+    root.addHandler(_handler)
+    root.setLevel(level or os.getenv('LOG_LEVEL', 'INFO'))
+    _pid = os.getpid()
+
+
+@atexit.register
+def _stop_listener() -> None:
+    """종료 전 큐에 남은 로그 출력"""
+    if _listener is not None and _pid == os.getpid():
+        _listener.stop()
@@ -1,102 +1,130 @@
 """
 명령어 파싱 엔진
 사용자의 음성/텍스트 입력을 분석하여 매매/조회 명령을 추출합니다.
-GPT-3.5를 우선 사용하고, 실패시 기존 규칙 기반 파서를 사용합니다.
+규칙 기반 파서를 먼저 사용하고, 인식하지 못한 명령만 GPT-3.5로 분석합니다.
 """
 
 from typing import Optional, Dict
 import re
-import difflib
-import openai
+import hashlib
+import logging
 import os
+import orjson
 from dotenv import load_dotenv
+from rapidfuzz import fuzz, process
+
+from cache import LRUCache
+from stock_names import STOCK_DATABASE
+
+logger = logging.getLogger(__name__)
 
 # 환경변수 로드
 load_dotenv()
-openai.api_key = os.getenv('OPENAI_API_KEY')
-
-
-# ===== 1. 종목 데이터베이스 =====
-STOCK_DATABASE = {
-    "삼성전자": "005930",
-    "SK하이닉스": "000660",
-    "네이버": "035420",
-    "카카오": "035720",
-    "현대자동차": "005380",
-    "LG전자": "066570",
-    "삼성바이오로직스": "207940",
-    "POSCO홀딩스": "005490",
-    "LG화학": "051910",
-    "기아": "000270",
-    "삼성SDI": "006400",
-    "셀트리온": "068270",
-    "SK이노베이션": "096770",
-    "KB금융": "105560",
-    "신한지주": "055550",
-    "하나금융지주": "086790",
-    "NAVER": "035420",
-    "삼성물산": "028260",
-    "LG생활건강": "051900",
-    "삼성생명": "032830",
-    "한국전력": "015760",
-    "포스코": "005490",
-    "현대모비스": "012330",
-    "SK텔레콤": "017670",
-    "KT": "030200",
-    "LG유플러스": "032640",
-    "엔씨소프트": "036570",
-    "넷마블": "251270",
-    "크래프톤": "259960",
-    "카카오뱅크": "323410",
-    "카카오페이": "377300",
-}
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+
+# ===== 1. 종목 데이터베이스 (stock_names.py) =====
+# 종목명 목록 (Fuzzy Matching 후보, 모듈 로드시 1회 생성)
+STOCK_NAMES = tuple(STOCK_DATABASE)
+
+# 종목명 검색용 정규식 (모듈 로드시 1회 컴파일, 긴 이름 우선)
+# 예: "카카오뱅크"가 "카카오"보다 먼저 매칭됨
+STOCK_PATTERN = re.compile('|'.join(
+    re.escape(name) for name in sorted(STOCK_DATABASE, key=len, reverse=True)
+))
 
 
 # ===== 2. GPT 파싱 함수 =====
-def parse_with_gpt(text: str) -> Dict:
-    """GPT를 사용한 명령어 파싱 (실패시 기존 파서 사용)"""
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": """
+GPT_MODEL = "gpt-3.5-turbo"
+
+# 응답은 3줄 고정 형식이므로 짧게, 같은 명령은 같은 결과가 나오도록 temperature 0
+GPT_MAX_TOKENS = 64
+GPT_TEMPERATURE = 0
+GPT_TIMEOUT = 10  # 초
+
+# GPT 응답 캐시 (정규화된 명령 해시 → 응답 텍스트, 1시간)
+GPT_CACHE = LRUCache(maxsize=2048, ttl=3600)
+
+_openai = None
+
+
+def get_openai():
+    """openai 모듈 (import가 무거우므로 GPT가 실제로 필요할 때 1회 설정)
+
+    openai 0.28은 스레드 로컬에 HTTP 세션을 두는데, gevent 환경에서는
+    요청(greenlet)마다 새 세션과 TLS 연결이 만들어집니다.
+    연결 풀을 가진 세션 하나를 공유해 연결을 재사용합니다.
+    """
+    global _openai
+    if _openai is None:
+        import openai
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        session.mount('https://', adapter)
+
+        openai.api_key = OPENAI_API_KEY
+        openai.requestssession = session
+        _openai = openai
+    return _openai
+
+
+def gpt_cache_key(text: str, model: str = GPT_MODEL) -> str:
+    """GPT 응답 캐시 키 (공백/대소문자/끝 문장부호 차이는 같은 명령으로 취급)"""
+    normalized = ' '.join(text.lower().split()).rstrip('?!.~ ')
+    return hashlib.blake2b(
+        f"{model}|{normalized}".encode('utf-8'), digest_size=16
+    ).hexdigest()
+
+
+def ask_gpt(text: str) -> str:
+    """GPT에 명령어 분석 요청 (응답 텍스트 반환, 같은 명령은 캐시 사용)"""
+    key = gpt_cache_key(text)
+    result = GPT_CACHE.get(key)
+    if result is not None:
+        return result
+
+    response = get_openai().ChatCompletion.create(
+        model=GPT_MODEL,
+        messages=[
+            {"role": "system", "content": """
 당신은 주식 거래 명령어를 분석하는 AI입니다.
 사용자의 자연어 명령을 분석해서 다음 정보를 추출하세요:
-- 행동: 매수, 매도, 현재가, 잔고, 보유종목
-- 종목명: 삼성전자, SK하이닉스, 네이버, 카카오 등 (정확한 이름으로 변환)
-- 수량: 숫자 (없으면 1)
-
-응답 형식:
-행동: [매수/매도/현재가/잔고/보유종목]
-종목: [종목명]
-수량: [숫자]
+- action: 매수, 매도, 현재가, 잔고, 보유종목 중 하나
+- stock: 삼성전자, SK하이닉스, 네이버, 카카오 등 (정확한 이름으로 변환, 없으면 null)
+- quantity: 숫자 (없으면 1, "전부/전량/모두" 등 전량 매매는 -1)
+
+JSON으로만 응답하세요:
+{"action": "매수", "stock": "삼성전자", "quantity": 10}
 """},
-                {"role": "user", "content": text}
-            ],
-            max_tokens=100,
-            temperature=0.3
-        )
-        
-        result = response.choices[0].message.content
-        print(f"GPT 분석: {result}")  # 디버깅용
-        
-        # GPT 응답을 파싱
-        lines = result.strip().split('\n')
-        action = None
-        stock = None
-        quantity = 1
+            {"role": "user", "content": text}
+        ],
+        max_tokens=GPT_MAX_TOKENS,
+        temperature=GPT_TEMPERATURE,
+        request_timeout=GPT_TIMEOUT,
+        response_format={"type": "json_object"}
+    )
+    result = response.choices[0].message.content
+    GPT_CACHE.set(key, result)
+    return result
+
+
+def parse_with_gpt(text: str) -> Dict:
+    """GPT를 사용한 명령어 파싱 (실패시 기존 파서 사용)"""
+    try:
+        result = ask_gpt(text)
+        logger.debug("GPT 분석: %s", result)
         
-        for line in lines:
-            if '행동:' in line:
-                action = line.split(':')[1].strip()
-            elif '종목:' in line:
-                stock_name = line.split(':')[1].strip()
-                if stock_name != '없음':
-                    stock = stock_name
-            elif '수량:' in line:
-                qty = line.split(':')[1].strip()
-                if qty.isdigit():
-                    quantity = int(qty)
+        # GPT 응답(JSON)을 파싱
+        data = orjson.loads(result)
+        action = data.get('action')
+        stock = data.get('stock') or None
+        quantity = data.get('quantity')
+        if not isinstance(quantity, int):
+            qty = str(quantity).strip()
+            quantity = int(qty) if qty.lstrip('-').isdigit() else 1
         
         # 기존 형식으로 변환
         if action in ['매수', '매도']:
@@ -105,7 +133,7 @@ def parse_with_gpt(text: str) -> Dict:
                 'action': action,
                 'stock': stock,
                 'stock_code': STOCK_DATABASE.get(stock) if stock else None,
-                'quantity': quantity if quantity > 0 else 1,
+                'quantity': quantity if quantity > 0 or quantity == -1 else 1,  # -1: 전량
                 'price_type': '시장가',
                 'raw_text': text
             }
@@ -122,8 +150,8 @@ def parse_with_gpt(text: str) -> Dict:
         elif action in ['보유종목', '보유종목조회']:
             return {'type': 'query', 'query_type': '보유종목', 'raw_text': text}
     
-    except Exception as e:
-        print(f"GPT 파싱 실패, 기존 파서 사용: {str(e)}")
+    except Exception:
+        logger.warning("GPT 파싱 실패, 기존 파서 사용", exc_info=True)
     
     # GPT 실패시 기존 파서 사용
     return parse_command_original(text)
@@ -159,6 +187,46 @@ HOLDINGS_KEYWORDS = [
     '내가가진', '내것', '보유주식', '내종목'
 ]
 
+
+# 조회 유형 / 매매 행동 (앞에 있을수록 우선)
+QUERY_TYPES = (('price', '현재가'), ('balance', '잔고'), ('holdings', '보유종목'))
+ACTIONS = (('buy', '매수'), ('sell', '매도'))
+
+INTENT_KEYWORDS = {
+    'price': PRICE_KEYWORDS,
+    'balance': BALANCE_KEYWORDS,
+    'holdings': HOLDINGS_KEYWORDS,
+    'buy': BUY_KEYWORDS,
+    'sell': SELL_KEYWORDS,
+}
+
+
+def _keyword_alternation(keywords: list) -> str:
+    """키워드 목록을 정규식 alternation으로 변환 (긴 키워드 우선)"""
+    return '|'.join(
+        re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True)
+    )
+
+
+# 의도 감지용 정규식 (모듈 로드시 1회 컴파일, 입력을 한 번만 훑음)
+# 전방탐색(?=...)이라 글자를 소비하지 않아 모든 위치의 키워드를 찾음.
+# 같은 위치에서는 우선순위가 높은 그룹이 기록됨 ("얼마남았" → 현재가)
+# 대소문자 구분은 정규식에서 처리 (입력을 lower()로 복사하지 않음)
+INTENT_PATTERN = re.compile('(?=(?:{}))'.format('|'.join(
+    f'(?P<{name}>{_keyword_alternation(keywords)})'
+    for name, keywords in INTENT_KEYWORDS.items()
+)), re.IGNORECASE)
+
+# 수량/가격 추출용 정규식 (모듈 로드시 1회 컴파일)
+# 아라비아 숫자를 한글보다 먼저 검색 ("사주세요 5주"는 4가 아니라 5)
+QUANTITY_DIGIT_PATTERN = re.compile(r'(\d+)\s*주')
+QUANTITY_KOREAN_PATTERN = re.compile(r'([가-힣]+)\s*주')
+LIMIT_PRICE_PATTERN = re.compile(r'지정가\s*(\d+)')
+WON_PRICE_PATTERN = re.compile(r'(\d{4,})\s*원')
+
+# 전량 매매 ("다"는 "다 팔아", "다팔아"처럼 단독으로 쓰인 경우만, "감사합니다"/"다음에" 제외)
+ALL_IN_PATTERN = re.compile(r'전부|전량|모두|올인|(?<!\S)다(?=\s|$|팔|매|사|처)')
+
 # 한글 숫자 변환
 KOREAN_NUMBER_MAP = {
     '영': 0, '공': 0, '일': 1, '이': 2, '삼': 3,
@@ -167,6 +235,12 @@ KOREAN_NUMBER_MAP = {
     '천': 1000, '만': 10000
 }
 
+# 확실한 한글 수량: 한글 숫자로만 된 단어 + "주" ("오주", "이십주")
+# "삼성전자 주식"(삼성전자 주), "사주세요"(사주)는 제외
+QUANTITY_NUMERAL_PATTERN = re.compile(
+    r'(?<![가-힣])([{}]+)\s*주(?![가-힣])'.format(''.join(KOREAN_NUMBER_MAP))
+)
+
 
 def korean_to_number(text: str) -> int:
     """한글 숫자를 아라비아 숫자로 변환"""
@@ -179,9 +253,8 @@ def korean_to_number(text: str) -> int:
     current = 0
     
     for char in text:
-        if char in KOREAN_NUMBER_MAP:
-            value = KOREAN_NUMBER_MAP[char]
-            
+        value = KOREAN_NUMBER_MAP.get(char)  # 한 번만 조회
+        if value is not None:
             if value >= 10:
                 if current == 0:
                     current = 1
@@ -195,60 +268,47 @@ def korean_to_number(text: str) -> int:
     return total
 
 
+def detect_intents(text: str) -> set:
+    """문장에 포함된 키워드 분류 (예: {'price', 'buy'})"""
+    return {match.lastgroup for match in INTENT_PATTERN.finditer(text)}
+
+
+def _first_intent(intents: set, candidates: tuple) -> Optional[str]:
+    """우선순위가 가장 높은 의도 반환"""
+    for name, label in candidates:
+        if name in intents:
+            return label
+    return None
+
+
 def detect_action(text: str) -> Optional[str]:
     """매수/매도 행동 감지"""
-    text_lower = text.lower()
-    
-    for keyword in BUY_KEYWORDS:
-        if keyword in text_lower:
-            return "매수"
-    
-    for keyword in SELL_KEYWORDS:
-        if keyword in text_lower:
-            return "매도"
-    
-    return None
+    return _first_intent(detect_intents(text), ACTIONS)
 
 
 def detect_query_type(text: str) -> Optional[str]:
     """조회 유형 감지"""
-    text_lower = text.lower()
-    
-    for keyword in PRICE_KEYWORDS:
-        if keyword in text_lower:
-            return "현재가"
-    
-    for keyword in BALANCE_KEYWORDS:
-        if keyword in text_lower:
-            return "잔고"
-    
-    for keyword in HOLDINGS_KEYWORDS:
-        if keyword in text_lower:
-            return "보유종목"
-    
-    return None
+    return _first_intent(detect_intents(text), QUERY_TYPES)
 
 
 def match_stock(text: str) -> Optional[str]:
     """종목명 찾기 (오타 자동 수정)"""
-    stock_names = list(STOCK_DATABASE.keys())
-    
-    # 정확히 일치하는 종목 우선
-    for stock in stock_names:
-        if stock in text:
-            return stock
+    # 정확히 일치하는 종목 우선 (정규식 1회 검색)
+    match = STOCK_PATTERN.search(text)
+    if match:
+        return match.group()
     
-    # Fuzzy Matching
+    # Fuzzy Matching (rapidfuzz: 유사도 계산을 C로 처리, difflib과 같은 기준)
     words = re.findall(r'[가-힣A-Za-z0-9]+', text)
     for word in words:
-        matches = difflib.get_close_matches(
-            word, 
-            stock_names, 
-            n=1, 
-            cutoff=0.6
+        match = process.extractOne(
+            word,
+            STOCK_NAMES,
+            scorer=fuzz.ratio,
+            score_cutoff=60
         )
-        if matches:
-            return matches[0]
+        if match:
+            return match[0]
     
     return None
 
@@ -256,12 +316,12 @@ def match_stock(text: str) -> Optional[str]:
 def extract_quantity(text: str) -> Optional[int]:
     """주식 수량 추출"""
     # 아라비아 숫자 + "주"
-    match = re.search(r'(\d+)\s*주', text)
+    match = QUANTITY_DIGIT_PATTERN.search(text)
     if match:
         return int(match.group(1))
     
     # 한글 숫자 + "주"
-    match = re.search(r'([가-힣]+)\s*주', text)
+    match = QUANTITY_KOREAN_PATTERN.search(text)
     if match:
         korean_num = match.group(1)
         try:
@@ -271,8 +331,8 @@ def extract_quantity(text: str) -> Optional[int]:
         except:
             pass
     
-    # "전부", "전량", "모두"
-    if any(word in text for word in ['전부', '전량', '모두', '다']):
+    # "전부", "전량", "모두", "다"
+    if ALL_IN_PATTERN.search(text):
         return -1
     
     return None
@@ -283,12 +343,12 @@ def extract_price_type(text: str) -> tuple:
     if '시장가' in text:
         return ("시장가", 0)
     
-    match = re.search(r'지정가\s*(\d+)', text)
+    match = LIMIT_PRICE_PATTERN.search(text)
     if match:
         price = int(match.group(1))
         return ("지정가", price)
     
-    match = re.search(r'(\d{4,})\s*원', text)
+    match = WON_PRICE_PATTERN.search(text)
     if match:
         price = int(match.group(1))
         return ("지정가", price)
@@ -301,8 +361,11 @@ def parse_command_original(text: str) -> Dict:
     text = text.strip()
     result = {"raw_text": text}
     
+    # 키워드 분류는 1회만 수행
+    intents = detect_intents(text)
+    
     # 1. 조회 명령인지 확인
-    query_type = detect_query_type(text)
+    query_type = _first_intent(intents, QUERY_TYPES)
     if query_type:
         result["type"] = "query"
         result["query_type"] = query_type
@@ -316,7 +379,7 @@ def parse_command_original(text: str) -> Dict:
         return result
     
     # 2. 매매 명령인지 확인
-    action = detect_action(text)
+    action = _first_intent(intents, ACTIONS)
     if action:
         result["type"] = "trade"
         result["action"] = action
@@ -342,12 +405,66 @@ def parse_command_original(text: str) -> Dict:
 
 
 # ===== 4. 메인 파싱 함수 =====
-def parse_command(text: str) -> Dict:
-    """메인 파싱 함수 - GPT 우선, 실패시 기존 파서"""
-    if openai.api_key:
+def _certain_quantity(text: str) -> Optional[int]:
+    """오인식 가능성이 없는 수량 ("10주", "오주", 전량 -1)만 반환, 없으면 None"""
+    match = QUANTITY_DIGIT_PATTERN.search(text)
+    if match:
+        return int(match.group(1))
+
+    match = QUANTITY_NUMERAL_PATTERN.search(text)
+    if match:
+        return korean_to_number(match.group(1)) or None
+
+    if ALL_IN_PATTERN.search(text):
+        return -1
+
+    return None
+
+
+def is_complete_command(result: Dict) -> bool:
+    """규칙 기반 파싱 결과만으로 처리 가능한지 확인
+
+    종목/수량이 모두 확실히 인식된 매매, 종목이 인식된 현재가 조회, 잔고/보유종목 조회
+    실제 주문으로 이어지는 매매는 조금이라도 애매하면 GPT로 넘깁니다.
+    """
+    cmd_type = result.get("type")
+
+    if cmd_type == "trade":
+        raw_text = result.get("raw_text", "")
+        # 매수/매도 키워드가 함께 있으면 ("3주 팔고 사") 의도가 불분명
+        if {'buy', 'sell'} <= detect_intents(raw_text):
+            return False
+        # 수량은 "10주", 한글 숫자 단어("오주"), 전량("전부")에서 읽은 경우만 인정
+        quantity = result.get("quantity")
+        return bool(result.get("stock") and quantity
+                    and quantity == _certain_quantity(raw_text))
+
+    if cmd_type == "query":
+        # 매매 키워드도 함께 있으면 ("삼성전자 지금 사줘") 의도가 불분명하므로 GPT로
+        if detect_action(result.get("raw_text", "")):
+            return False
+        if result.get("query_type") == "현재가":
+            return bool(result.get("stock"))
+        return True
+
+    return False
+
+
+def _parse_command_with_gpt(text: str) -> Dict:
+    """규칙 기반 파서로 먼저 처리, 부족하면 GPT
+
+    "삼성전자 10주 사줘"처럼 정해진 형식의 명령은 GPT 호출(0.5~1.5초) 없이 바로 처리합니다.
+    """
+    result = parse_command_original(text)
+
+    if not is_complete_command(result):
         return parse_with_gpt(text)
-    else:
-        return parse_command_original(text)
+
+    return result
+
+
+# 메인 파싱 함수 (GPT 사용 여부는 import 시 1회 결정, API 키가 없으면 규칙 기반만)
+parse_command = _parse_command_with_gpt if OPENAI_API_KEY else parse_command_original
 
 
 # ===== 5. 테스트 함수 =====
@@ -375,5 +492,49 @@ def test_parser():
         print("-" * 70)
 
 
+def test_is_complete_command():
+    """GPT 생략 여부 회귀 테스트 (잘못 읽은 매매 명령은 GPT로 넘어가야 함)"""
+    complete_cases = [
+        "삼성전자 10주 사줘",
+        "LG화학 오주 매도",
+        "크래프톤 이십오주 매수",
+        "카카오 얼마야?",
+        "내 잔고 확인",
+        "현대차 전부 팔아",
+        "삼성전자 전량 매도",
+    ]
+    incomplete_cases = [
+        "삼성전자 주식 10개 사줘",  # "삼성전자 주" → 3주로 오인
+        "삼성전자 사주세요",        # "사주" → 4주로 오인
+        "삼성전자 3주 팔고 사",     # 매수/매도 동시
+        "삼성전자 주식 전부 팔아",  # "삼성전자 주" → 3주로 오인, 실제는 전량
+    ]
+
+    for text in complete_cases:
+        assert is_complete_command(parse_command_original(text)), text
+    for text in incomplete_cases:
+        assert not is_complete_command(parse_command_original(text)), text
+
+    print("GPT 생략 판단 테스트 통과")
+
+
+def test_gpt_sell_all():
+    """GPT 경로에서도 전량 매도(-1)가 1주로 바뀌지 않는지 확인 (GPT 응답은 가짜로 대체)"""
+    global ask_gpt
+    real_ask_gpt = ask_gpt
+    try:
+        for answer in ('{"action": "매도", "stock": "삼성전자", "quantity": -1}',
+                       '{"action": "매도", "stock": "삼성전자", "quantity": "-1"}'):
+            ask_gpt = lambda text: answer
+            result = parse_with_gpt("삼성전자 주식 전부 팔아")
+            assert result["quantity"] == -1, result
+    finally:
+        ask_gpt = real_ask_gpt
+
+    print("GPT 전량 매도 테스트 통과")
+
+
 if __name__ == "__main__":
+    test_is_complete_command()
+    test_gpt_sell_all()
     test_parser()
\ No newline at end of file
@@ -0,0 +1,35 @@
+-- 주문 내역과 봇 응답 로그를 한 트랜잭션으로 저장
+-- Database.save_order_and_log()에서 RPC로 호출합니다.
+-- Supabase SQL Editor에서 실행하세요.
+
+CREATE OR REPLACE FUNCTION save_order_with_log(
+    p_user_id BIGINT,
+    p_stock_code TEXT,
+    p_stock_name TEXT,
+    p_action TEXT,
+    p_quantity INTEGER,
+    p_price_type TEXT,
+    p_order_price NUMERIC,
+    p_order_no TEXT,
+    p_message TEXT
+)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order_id BIGINT;
+    v_chat_log_id BIGINT;
+BEGIN
+    INSERT INTO orders (user_id, stock_code, stock_name, action, quantity,
+                        price_type, order_price, status, order_no)
+    VALUES (p_user_id, p_stock_code, p_stock_name, p_action, p_quantity,
+            p_price_type, p_order_price, '대기', p_order_no)
+    RETURNING id INTO v_order_id;
+
+    INSERT INTO chat_logs (user_id, message, sender)
+    VALUES (p_user_id, p_message, 'bot')
+    RETURNING id INTO v_chat_log_id;
+
+    RETURN json_build_object('order_id', v_order_id, 'chat_log_id', v_chat_log_id);
+END;
+$$;
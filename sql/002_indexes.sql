@@ -0,0 +1,9 @@
+-- 조회용 복합 인덱스
+-- get_user_orders, get_chat_history의 "user_id 조건 + 시간 정렬 + LIMIT" 쿼리를
+-- 전체 스캔/정렬 없이 인덱스 범위 스캔으로 처리합니다.
+
+CREATE INDEX IF NOT EXISTS ix_orders_user_time
+    ON orders (user_id, order_time DESC);
+
+CREATE INDEX IF NOT EXISTS ix_chat_logs_user_ts
+    ON chat_logs (user_id, timestamp DESC);
@@ -0,0 +1,20 @@
+-- 사용자별 주문 통계 (건수만 집계해서 반환)
+-- Database.get_order_statistics()에서 RPC로 호출합니다.
+-- Supabase SQL Editor에서 실행하세요.
+
+CREATE OR REPLACE FUNCTION get_order_stats(p_user_id BIGINT)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_orders', COUNT(*),
+        'buy_orders', COUNT(*) FILTER (WHERE action = '매수'),
+        'sell_orders', COUNT(*) FILTER (WHERE action = '매도'),
+        'completed_orders', COUNT(*) FILTER (WHERE status = '체결'),
+        'pending_orders', COUNT(*) FILTER (WHERE status = '대기'),
+        'canceled_orders', COUNT(*) FILTER (WHERE status = '취소')
+    )
+    FROM orders
+    WHERE user_id = p_user_id;
+$$;
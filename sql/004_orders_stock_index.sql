@@ -0,0 +1,12 @@
+-- 종목별 주문 조회용 복합 인덱스
+-- get_orders_by_stock의 "user_id + stock_code 조건 + 시간 정렬" 쿼리를 인덱스 범위 스캔으로 처리합니다.
+-- (user_id, order_time), (user_id, timestamp) 인덱스는 002_indexes.sql에 있습니다.
+--
+-- CONCURRENTLY: 운영 중 테이블 쓰기를 막지 않고 인덱스 생성
+-- 트랜잭션 안에서는 실행할 수 없으므로 이 문장만 따로 실행하세요. (psql 또는 SQL Editor)
+-- 적용 확인:
+--   EXPLAIN ANALYZE SELECT * FROM orders
+--   WHERE user_id = 1 AND stock_code = '005930' ORDER BY order_time DESC;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_user_stock_time
+    ON orders (user_id, stock_code, order_time DESC);
@@ -0,0 +1,30 @@
+-- 오래된 채팅 로그 삭제
+-- purge_old_chat_logs: 삭제 건수만 반환 (Database.delete_old_chat_logs에서 RPC로 호출)
+-- pg_cron: 매일 한국 시간 새벽 3시(UTC 18시, pg_cron은 UTC 기준)에 30일 지난 로그 자동 삭제
+-- Supabase 대시보드 → Database → Extensions에서 pg_cron을 켠 뒤 SQL Editor에서 실행하세요.
+
+CREATE OR REPLACE FUNCTION purge_old_chat_logs(p_days INTEGER DEFAULT 30)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM chat_logs
+    WHERE timestamp < now() - make_interval(days => p_days);
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$;
+
+CREATE EXTENSION IF NOT EXISTS pg_cron;
+
+SELECT cron.schedule(
+    'purge_chat_logs',
+    '0 18 * * *',  -- 03:00 KST
+    $$SELECT purge_old_chat_logs(30)$$
+);
+
+-- 실행 기록 확인: SELECT * FROM cron.job_run_details ORDER BY start_time DESC LIMIT 5;
+-- 해제: SELECT cron.unschedule('purge_chat_logs');
@@ -0,0 +1,46 @@
+"""
+종목 데이터
+종목명 ↔ 종목코드 변환 (API 호출 없이 메모리에서 조회)
+"""
+
+from typing import Dict
+
+# 종목명(별칭 포함) → 종목코드
+STOCK_DATABASE: Dict[str, str] = {
+    "삼성전자": "005930",
+    "SK하이닉스": "000660",
+    "네이버": "035420",
+    "카카오": "035720",
+    "현대자동차": "005380",
+    "LG전자": "066570",
+    "삼성바이오로직스": "207940",
+    "POSCO홀딩스": "005490",
+    "LG화학": "051910",
+    "기아": "000270",
+    "삼성SDI": "006400",
+    "셀트리온": "068270",
+    "SK이노베이션": "096770",
+    "KB금융": "105560",
+    "신한지주": "055550",
+    "하나금융지주": "086790",
+    "NAVER": "035420",
+    "삼성물산": "028260",
+    "LG생활건강": "051900",
+    "삼성생명": "032830",
+    "한국전력": "015760",
+    "포스코": "005490",
+    "현대모비스": "012330",
+    "SK텔레콤": "017670",
+    "KT": "030200",
+    "LG유플러스": "032640",
+    "엔씨소프트": "036570",
+    "넷마블": "251270",
+    "크래프톤": "259960",
+    "카카오뱅크": "323410",
+    "카카오페이": "377300",
+}
+
+# 종목코드 → 대표 종목명 (별칭이 여러 개면 먼저 나온 이름)
+STOCK_CODE_TO_NAME: Dict[str, str] = {
+    code: name for name, code in reversed(STOCK_DATABASE.items())
+}
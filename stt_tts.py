@@ -4,18 +4,61 @@
 - gTTS: 텍스트 → 음성
 """
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from gtts import gTTS
+import functools
+import hashlib
 import io
-from typing import Optional
+import logging
+import os
+from typing import BinaryIO, Iterator, Optional, Union
 
+from cache import LRUCache
 
-def clova_stt(audio_data: bytes, client_id: str, client_secret: str,
-              lang: str = "Kor") -> Optional[str]:
+logger = logging.getLogger(__name__)
+
+# Clova API 호출용 HTTP 세션 (연결 재사용)
+# gevent 워커는 동시 요청이 많으므로 기본값(10)보다 큰 연결 풀 사용
+STT_POOL_SIZE = int(os.getenv('CLOVA_POOL_SIZE', 32))
+
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=STT_POOL_SIZE))
+_SESSION.headers.update({"Content-Type": "application/octet-stream"})
+
+CLOVA_STT_URL = "https://naveropenapi.apigw.ntruss.com/recog/v1/stt?lang={lang}"
+
+# TTS 결과 저장 폴더 (반복되는 봇 응답은 다시 생성하지 않음)
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', '.tts_cache')
+
+# 자주 쓰는 봇 응답 음성은 메모리에도 보관 (디스크 읽기 생략)
+# 짧은 응답 MP3는 수십 KB이므로 워커당 최대 수 MB
+TTS_CACHE = LRUCache(maxsize=128)
+
+
+@functools.lru_cache(maxsize=8)
+def _stt_headers(client_id: str, client_secret: str) -> dict:
+    """Clova 인증 헤더 (키는 서버 실행 중 바뀌지 않으므로 1회 생성, 수정 금지)"""
+    return {
+        "X-NCP-APIGW-API-KEY-ID": client_id,
+        "X-NCP-APIGW-API-KEY": client_secret
+    }
+
+
+@functools.lru_cache(maxsize=8)
+def _stt_url(lang: str) -> str:
+    """언어별 Clova STT 요청 URL"""
+    return CLOVA_STT_URL.format(lang=lang)
+
+
+def clova_stt(audio_data: Union[bytes, BinaryIO], client_id: str,
+              client_secret: str, lang: str = "Kor") -> Optional[str]:
     """Clova STT API를 사용하여 음성을 텍스트로 변환
 
     Args:
-        audio_data: 음성 파일 바이너리 데이터 (WAV, MP3 등)
+        audio_data: 음성 파일 바이너리 데이터 또는 파일 객체 (WAV, MP3 등)
+            파일 객체를 넘기면 메모리에 전부 읽지 않고 그대로 전송합니다.
         client_id: Clova API Client ID
         client_secret: Clova API Client Secret
         lang: 언어 (Kor=한국어, Jpn=일본어, Eng=영어, Chn=중국어)
@@ -29,40 +72,36 @@ def clova_stt(audio_data: bytes, client_id: str, client_secret: str,
         >>> text = clova_stt(audio_data, 'client_id', 'client_secret')
         >>> print(text)
         '삼성전자 10주 사줘'
-    """
-    url = f"https://naveropenapi.apigw.ntruss.com/recog/v1/stt?lang={lang}"
-
-    headers = {
-        "X-NCP-APIGW-API-KEY-ID": client_id,
-        "X-NCP-APIGW-API-KEY": client_secret,
-        "Content-Type": "application/octet-stream"
-    }
 
+        >>> # Flask 업로드 파일은 stream을 그대로 전달
+        >>> text = clova_stt(request.files['audio'].stream, 'client_id', 'client_secret')
+    """
     try:
-        response = requests.post(
-            url,
-            headers=headers,
+        # Content-Type은 세션 기본 헤더, 인증 헤더는 키별로 1회 생성
+        response = _SESSION.post(
+            _stt_url(lang),
+            headers=_stt_headers(client_id, client_secret),
             data=audio_data,
             timeout=10
         )
 
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             text = result.get('text', '')
 
             if text:
-                print(f"음성 인식 성공: {text}")
+                logger.debug("음성 인식 성공: %s", text)
                 return text
             else:
-                print("음성 인식 실패: 텍스트 없음")
+                logger.info("음성 인식 실패: 텍스트 없음")
                 return None
         else:
-            print(f"음성 인식 실패: HTTP {response.status_code}")
-            print(f"   응답: {response.text}")
+            logger.warning("음성 인식 실패: HTTP %s, 응답: %s",
+                           response.status_code, response.text)
             return None
 
-    except Exception as e:
-        print(f"Clova STT 오류: {str(e)}")
+    except Exception:
+        logger.exception("Clova STT 오류")
         return None
 
 
@@ -82,6 +121,11 @@ def text_to_speech(text: str, lang: str = 'ko', slow: bool = False) -> io.BytesI
         >>> # Flask에서 send_file(audio_fp, mimetype='audio/mp3')
     """
     try:
+        # 캐시된 음성이 있으면 바로 반환
+        cached = _load_cached_tts(text, lang, slow)
+        if cached:
+            return io.BytesIO(cached)
+
         # gTTS로 음성 생성
         tts = gTTS(text=text, lang=lang, slow=slow)
 
@@ -90,14 +134,109 @@ def text_to_speech(text: str, lang: str = 'ko', slow: bool = False) -> io.BytesI
         tts.write_to_fp(audio_fp)
         audio_fp.seek(0)
 
-        print(f"TTS 생성 성공: {len(text)}자")
+        logger.debug("TTS 생성 성공: %d자", len(text))
+        _store_cached_tts(text, lang, slow, audio_fp.getvalue())
         return audio_fp
 
-    except Exception as e:
-        print(f"TTS 생성 오류: {str(e)}")
+    except Exception:
+        logger.exception("TTS 생성 오류")
         raise
 
 
+def _tts_cache_path(text: str, lang: str, slow: bool) -> str:
+    """TTS 캐시 파일 경로 (텍스트/언어/속도별 MD5)"""
+    key = hashlib.md5(f"{text}|{lang}|{slow}".encode('utf-8')).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+
+
+def _load_cached_tts(text: str, lang: str, slow: bool) -> Optional[bytes]:
+    """캐시된 TTS 음성 조회 (메모리 → 디스크 순, 없으면 None)"""
+    key = (text, lang, slow)
+    cached = TTS_CACHE.get(key)
+    if cached:
+        return cached
+
+    cache_path = _tts_cache_path(text, lang, slow)
+    cached = load_audio_file(cache_path) if os.path.exists(cache_path) else None
+    if cached:
+        TTS_CACHE.set(key, cached)
+    return cached
+
+
+def _store_cached_tts(text: str, lang: str, slow: bool, audio_data: bytes) -> None:
+    """생성한 TTS 음성을 메모리와 디스크에 저장"""
+    TTS_CACHE.set((text, lang, slow), audio_data)
+
+    try:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        cache_path = _tts_cache_path(text, lang, slow)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        if save_audio_file(audio_data, tmp_path):
+            os.replace(tmp_path, cache_path)
+    except Exception:
+        logger.exception("TTS 캐시 저장 오류")
+
+
+def text_to_speech_stream(text: str, lang: str = 'ko',
+                          slow: bool = False) -> Iterator[bytes]:
+    """gTTS를 사용하여 텍스트를 음성으로 변환 (생성되는 대로 전송)
+
+    전체 음성이 만들어질 때까지 기다리지 않고 조각 단위로 반환합니다.
+    생성이 끝난 음성은 메모리/디스크에 저장해 두고 같은 요청이면 바로 반환합니다.
+
+    Args:
+        text: 변환할 텍스트
+        lang: 언어 (ko=한국어, en=영어, ja=일본어, zh-CN=중국어)
+        slow: 느리게 말하기 (True/False)
+
+    Yields:
+        bytes: MP3 음성 데이터 조각
+
+    Example:
+        >>> # Flask에서 Response(text_to_speech_stream("안녕하세요"), mimetype='audio/mp3')
+    """
+    # 캐시된 음성이 있으면 바로 반환
+    cached = _load_cached_tts(text, lang, slow)
+    if cached:
+        yield cached
+        return
+
+    # gTTS로 음성 생성 (조각 단위)
+    chunks = []
+    for chunk in gTTS(text=text, lang=lang, slow=slow).stream():
+        chunks.append(chunk)
+        yield chunk
+
+    logger.debug("TTS 생성 성공: %d자", len(text))
+
+    # 전체 생성이 끝난 경우에만 캐시 저장
+    _store_cached_tts(text, lang, slow, b''.join(chunks))
+
+
+def warm_tts_cache(texts, lang: str = 'ko', slow: bool = False) -> int:
+    """고정 응답 음성을 미리 생성해 캐시에 저장 (워커 시작 시 백그라운드에서 1회)
+
+    이미 디스크에 있는 음성은 메모리로만 읽어오므로 gTTS 호출은 처음 배포 때만 발생합니다.
+
+    Args:
+        texts: 미리 생성할 텍스트 목록
+        lang: 언어
+        slow: 느리게 말하기
+
+    Returns:
+        int: 캐시에 준비된 음성 수
+    """
+    ready = 0
+    for text in texts:
+        try:
+            if not _load_cached_tts(text, lang, slow):
+                text_to_speech(text, lang, slow)
+            ready += 1
+        except Exception:
+            logger.warning("TTS 미리 생성 실패: %s", text)
+    return ready
+
+
 def save_audio_file(audio_data: bytes, file_path: str) -> bool:
     """음성 데이터를 파일로 저장
 
@@ -111,11 +250,11 @@ def save_audio_file(audio_data: bytes, file_path: str) -> bool:
     try:
         with open(file_path, 'wb') as f:
             f.write(audio_data)
-        print(f"음성 파일 저장 성공: {file_path}")
+        logger.debug("음성 파일 저장 성공: %s", file_path)
         return True
 
-    except Exception as e:
-        print(f"파일 저장 오류: {str(e)}")
+    except Exception:
+        logger.exception("파일 저장 오류")
         return False
 
 
@@ -131,11 +270,11 @@ def load_audio_file(file_path: str) -> Optional[bytes]:
     try:
         with open(file_path, 'rb') as f:
             audio_data = f.read()
-        print(f"음성 파일 로드 성공: {file_path}")
+        logger.debug("음성 파일 로드 성공: %s", file_path)
         return audio_data
 
-    except Exception as e:
-        print(f"파일 로드 오류: {str(e)}")
+    except Exception:
+        logger.exception("파일 로드 오류")
         return None
 
 